@@ -0,0 +1,160 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Priority lanes: lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITIES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "batch": PRIORITY_BATCH,
+}
+
+class AdmissionRejected(Exception):
+    """Raised when a stage cannot accept more work"""
+
+    def __init__(self, stage: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(f"{stage}: {reason}")
+        self.stage = stage
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+class Stage:
+    """
+    Bounded in-flight limit with a priority wait queue.
+
+    Up to `limit` callers hold a slot at once. Others wait in a queue ordered
+    by priority (then arrival), for at most `queue_timeout` seconds.
+    Requests that would overflow the queue are rejected immediately with
+    429; requests that wait past the deadline are rejected with 503. Batch
+    requests may only use `batch_queue` of the queue places, so they are
+    shed before interactive ones.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float, batch_queue: int = None):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.batch_queue = max_queue // 2 if batch_queue is None else batch_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._service_time = None
+
+    @property
+    def queued(self) -> int:
+        return sum(self.waiting.values())
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a slot frees up for a new request"""
+        service_time = self._service_time or self.queue_timeout
+        return max(1, math.ceil(service_time * (self.queued + 1) / max(self.limit, 1)))
+
+    def _reject(self, status_code: int, reason: str):
+        self.rejected += 1
+        raise AdmissionRejected(self.name, status_code, self.retry_after(), reason)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        """Wait for a slot, or raise AdmissionRejected"""
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        queue_limit = self.max_queue if priority == PRIORITY_INTERACTIVE else self.batch_queue
+        if self.queued >= queue_limit:
+            self._reject(429, "queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self.waiting[priority] += 1
+
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject(503, "queue deadline exceeded")
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self.waiting[priority] -= 1
+
+        self.admitted += 1
+
+    def release(self, held_for: float = None):
+        """Free a slot, handing it straight to the next live waiter"""
+        if held_for is not None:
+            if self._service_time is None:
+                self._service_time = held_for
+            else:
+                self._service_time = 0.8 * self._service_time + 0.2 * held_for
+
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+class AdmissionController:
+    """Admission control for the stages of the prediction pipeline"""
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+
+    def slot(self, stage: str, priority: int = PRIORITY_INTERACTIVE):
+        return self.stages[stage].slot(priority)
+
+    def snapshot(self) -> dict:
+        return {name: stage.snapshot() for name, stage in self.stages.items()}
+
+def _stage_from_env(name: str, limit: int, max_queue: int, queue_timeout: float) -> Stage:
+    prefix = f"ADMISSION_{name.upper()}"
+    return Stage(
+        name,
+        limit=int(os.getenv(f"{prefix}_LIMIT", limit)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+        queue_timeout=float(os.getenv(f"{prefix}_TIMEOUT", queue_timeout)),
+    )
+
+# Global admission controller
+admission = AdmissionController([
+    _stage_from_env("ingest", limit=8, max_queue=16, queue_timeout=2.0),
+    _stage_from_env("inference", limit=2, max_queue=16, queue_timeout=5.0),
+    _stage_from_env("llm", limit=4, max_queue=16, queue_timeout=10.0),
+])
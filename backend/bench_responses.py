@@ -0,0 +1,112 @@
+"""
+Benchmark response serialization and compression
+Compares the previous path (stdlib json, uncompressed) against orjson,
+pydantic-core dump_json, gzip and Brotli for typical API payloads.
+Run with: python bench_responses.py (no server or model needed)
+"""
+
+import gzip
+import json
+import timeit
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+
+from schemas import PredictionResponse, PredictionWithAnalysisResponse, HistoryRecord, ClassProbability
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RUNS = 2000
+
+def sample_prediction() -> PredictionWithAnalysisResponse:
+    """A /predict response with a typical-length Gemini analysis"""
+    now = datetime.utcnow()
+    analysis = (
+        "The specialized vision model has identified this lesion as a melanocytic nevus, "
+        "commonly known as a mole, with high confidence. Nevi are benign growths of "
+        "pigment-producing cells. Your image and this analysis report have been securely "
+        "archived in our database to help us monitor your skin's health progress over time. "
+    ) * 8
+    return PredictionWithAnalysisResponse(
+        gemini_analysis=analysis,
+        model_response=PredictionResponse(
+            prediction="nevus",
+            confidence=0.9234,
+            severity_level="low",
+            recommendation="The model detected nevus with 92.3% confidence. This appears to be a low-risk condition.",
+            timestamp=now,
+            session_id="3f1c2a4e-8a7b-4b1e-9d3c-2e5f6a7b8c9d",
+            model_version="f4eaeab865e6",
+            top_k=[
+                ClassProbability(class_name="nevus", probability=0.9234),
+                ClassProbability(class_name="melanoma", probability=0.0512),
+                ClassProbability(class_name="seborrheic keratosis", probability=0.0121),
+            ],
+        ),
+        session_id="3f1c2a4e-8a7b-4b1e-9d3c-2e5f6a7b8c9d",
+        timestamp=now,
+    )
+
+def sample_history(n: int = 100) -> list[HistoryRecord]:
+    """A /history response with n records"""
+    now = datetime.utcnow()
+    classes = ["nevus", "melanoma", "basal cell carcinoma", "vascular lesion"]
+    return [
+        HistoryRecord(
+            id=i,
+            image_path=f"uploads/20260109_1750{i % 60:02d}_ISIC_{24000 + i:07d}.jpg",
+            prediction=classes[i % len(classes)],
+            confidence=0.5 + (i % 50) / 100,
+            timestamp=now - timedelta(minutes=i),
+            model_version="f4eaeab865e6",
+        )
+        for i in range(n)
+    ]
+
+def stdlib_json(content) -> bytes:
+    """What FastAPI's default JSONResponse does after serializing the model"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def bench(label: str, fn):
+    seconds = timeit.timeit(fn, number=RUNS) / RUNS
+    print(f"  {label:<38} {seconds * 1e6:8.1f} us")
+
+def bench_payload(name: str, value, adapter: TypeAdapter):
+    print(f"\n{name}")
+    print("-" * 60)
+
+    print("Serialization time (per response):")
+    bench("json (before)", lambda: stdlib_json(adapter.dump_python(value, mode="json")))
+    if orjson is not None:
+        bench("orjson (ORJSONResponse)", lambda: orjson.dumps(adapter.dump_python(value, mode="json")))
+    bench("pydantic-core dump_json", lambda: adapter.dump_json(value))
+
+    body = adapter.dump_json(value)
+    print("Bytes on wire:")
+    print(f"  {'uncompressed (before)':<38} {len(body):8d}")
+    print(f"  {'gzip level 9':<38} {len(gzip.compress(body, 9)):8d}")
+    if brotli is not None:
+        print(f"  {'brotli quality 4':<38} {len(brotli.compress(body, quality=4)):8d}")
+
+def main():
+    print("=" * 60)
+    print("Response serialization and compression benchmark")
+    print("=" * 60)
+    if orjson is None:
+        print("orjson not installed, skipping orjson timings")
+    if brotli is None:
+        print("brotli not installed, skipping Brotli sizes")
+
+    bench_payload("POST /predict", sample_prediction(), TypeAdapter(PredictionWithAnalysisResponse))
+    bench_payload("GET /history?limit=100", sample_history(), TypeAdapter(list[HistoryRecord]))
+
+if __name__ == "__main__":
+    main()
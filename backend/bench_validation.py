@@ -0,0 +1,103 @@
+"""
+Benchmark upload validation
+Compares the cost of the header-only checks in validation.py with the full
+decode + preprocessing that every upload goes through, and shows how fast
+oversized images and decompression bombs are rejected.
+Run with: python bench_validation.py (no server or model needed)
+"""
+
+import io
+import struct
+import timeit
+import zlib
+
+import numpy as np
+from PIL import Image
+
+import validation
+from validation import validate_image, ImageRejected
+from utils import preprocess_image
+
+def photo_jpeg(width: int, height: int) -> bytes:
+    """A JPEG with smooth gradients and sensor-like noise, sized like a real photo"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def png_bomb(width: int, height: int, rows: int = None) -> bytes:
+    """
+    An RGB PNG of all-black pixels. With rows=None the pixel data is
+    complete (a genuine decompression bomb); otherwise only the first rows
+    are present, as in a crafted header.
+    """
+    row = b"\x00" * (1 + width * 3)
+    compressor = zlib.compressobj(9)
+    compressed = b"".join(compressor.compress(row) for _ in range(rows if rows is not None else height))
+    compressed += compressor.flush()
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header) + _png_chunk(b"IDAT", compressed) + _png_chunk(b"IEND", b"")
+
+def animated_gif() -> bytes:
+    frames = [Image.new("RGB", (256, 256), color) for color in ("red", "green", "blue", "white")]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:])
+    return buffer.getvalue()
+
+def per_call(fn, runs: int) -> float:
+    return timeit.timeit(fn, number=runs) / runs
+
+def bench_legit(name: str, data: bytes):
+    validate_s = per_call(lambda: validate_image(data), 2000)
+    decode_s = per_call(lambda: preprocess_image(data), 20)
+    print(f"  {name:<28} {len(data) / 1024:8.0f} KB  validate {validate_s * 1e6:7.1f} us"
+          f"  decode+preprocess {decode_s * 1e3:7.1f} ms  overhead {validate_s / decode_s:6.2%}")
+
+def bench_rejected(name: str, data: bytes, decoded_bytes: int = None):
+    def reject():
+        try:
+            validate_image(data)
+        except ImageRejected as e:
+            return e
+        raise AssertionError(f"{name} was accepted")
+
+    error = reject()
+    reject_s = per_call(reject, 2000)
+    decoded = f"  (decodes to {decoded_bytes / 2**20:,.0f} MB)" if decoded_bytes else ""
+    print(f"  {name:<28} {len(data) / 1024:8.0f} KB  rejected {reject_s * 1e6:7.1f} us  -> {error.status_code}{decoded}")
+
+def main():
+    print("=" * 60)
+    print("Upload validation benchmark")
+    print("=" * 60)
+    print(f"Limits: {validation.MAX_UPLOAD_BYTES} bytes, {validation.MAX_IMAGE_PIXELS} pixels, "
+          f"{validation.MAX_IMAGE_DIMENSION} px per side, {validation.MAX_IMAGE_FRAMES} frame(s)")
+
+    print("\nAccepted uploads (validation vs. the decode it protects):")
+    bench_legit("dermatoscope JPEG 1024x768", photo_jpeg(1024, 768))
+    bench_legit("phone JPEG 4032x3024", photo_jpeg(4032, 3024))
+
+    print("\nRejected uploads (no pixels decoded):")
+    bomb = png_bomb(7000, 7000)
+    bench_rejected("PNG bomb 7000x7000", bomb, 7000 * 7000 * 3)
+    bench_rejected("crafted PNG 60000x60000", png_bomb(60000, 60000, rows=1), 60000 * 60000 * 3)
+    bench_rejected("animated GIF", animated_gif())
+    bench_rejected("not an image", b"<html>" + b"x" * 4096)
+
+    # What the bomb cost before validation existed
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        decode_s = per_call(lambda: preprocess_image(bomb), 1)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+    print(f"\nDecoding the 7000x7000 bomb without validation took {decode_s * 1e3:,.0f} ms")
+
+if __name__ == "__main__":
+    main()
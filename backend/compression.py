@@ -0,0 +1,37 @@
+import os
+from starlette.middleware.gzip import GZipMiddleware
+from dotenv import load_dotenv
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+load_dotenv()
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Routes serving already-compressed images
+UNCOMPRESSED_PREFIXES = ("/images/", "/explain/")
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli (when brotli-asgi is installed) or gzip.
+
+    Clients pick the encoding through Accept-Encoding; Brotli falls back to
+    gzip for clients that do not support it. Image routes are passed
+    through untouched, since PNG/WebP/JPEG do not shrink any further.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith(UNCOMPRESSED_PREFIXES):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
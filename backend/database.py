@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, DateTime, Date
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -9,7 +9,9 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chat_history.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Several API processes may share the database in scale-out mode, so wait
+# for a competing writer instead of failing with "database is locked"
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -22,10 +24,41 @@ class ClassificationRecord(Base):
     prediction = Column(String, nullable=False)
     confidence = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow)
+    model_version = Column(String, nullable=True)
+    # Set when a record is deleted; the maintenance job reclaims it later
+    deleted_at = Column(DateTime, nullable=True, index=True)
+
+class ClassificationStatsBucket(Base):
+    """Rollup of classification counts per day, class and confidence bucket"""
+    __tablename__ = "classification_stats"
+    
+    day = Column(Date, primary_key=True)
+    prediction = Column(String, primary_key=True)
+    confidence_bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+def _add_missing_columns():
+    """Add columns introduced after an existing table was created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
 
 def get_db():
     """Dependency for getting database session"""
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+from model_loader import model_loader, CLASS_NAMES
+from utils import preprocess_image
+
+load_dotenv()
+
+# Where rendered heatmaps are cached, keyed by image hash + model version
+EXPLAIN_CACHE_DIR = Path(os.getenv("EXPLAIN_CACHE_DIR", "./uploads/explanations"))
+# Backward passes are expensive, so only a few run at once and only a few may wait
+EXPLAIN_WORKERS = int(os.getenv("EXPLAIN_WORKERS", "1"))
+EXPLAIN_MAX_PENDING = int(os.getenv("EXPLAIN_MAX_PENDING", "4"))
+# Longest side of the returned overlay
+EXPLAIN_MAX_SIZE = int(os.getenv("EXPLAIN_MAX_SIZE", "512"))
+
+class ExplainerBusy(Exception):
+    """Raised when too many explanations are already queued"""
+
+def _colorize(cam: np.ndarray) -> np.ndarray:
+    """Map a [0, 1] heatmap to RGB using a blue-green-red ramp"""
+    red = np.clip(1.5 - np.abs(4 * cam - 3), 0, 1)
+    green = np.clip(1.5 - np.abs(4 * cam - 2), 0, 1)
+    blue = np.clip(1.5 - np.abs(4 * cam - 1), 0, 1)
+    return (np.stack([red, green, blue], axis=-1) * 255).astype(np.uint8)
+
+def render_overlay(image_bytes: bytes, cam: np.ndarray) -> bytes:
+    """
+    Blend a Grad-CAM heatmap over the original image.
+
+    Args:
+        image_bytes: Original image bytes
+        cam: Heatmap normalized to [0, 1]
+
+    Returns:
+        Compressed PNG bytes
+    """
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    image.thumbnail((EXPLAIN_MAX_SIZE, EXPLAIN_MAX_SIZE))
+
+    # The model sees a squashed 224x224 resize, so stretching the map back
+    # to the image size keeps it aligned
+    heat = Image.fromarray((cam * 255).astype(np.uint8)).resize(image.size, Image.BILINEAR)
+    heat = Image.fromarray(_colorize(np.asarray(heat) / 255.0))
+
+    overlay = Image.blend(image, heat, alpha=0.45)
+
+    buffer = io.BytesIO()
+    overlay.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+class GradCAMExplainer:
+    """Computes and caches Grad-CAM overlays in a bounded worker pool"""
+
+    def __init__(self, cache_dir: Path = EXPLAIN_CACHE_DIR, workers: int = EXPLAIN_WORKERS, max_pending: int = EXPLAIN_MAX_PENDING):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gradcam")
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def cache_path(self, image_bytes: bytes, class_name: str) -> Path:
+        """Cache location for an image, explained class and current model version"""
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        class_slug = class_name.replace(" ", "_")
+        return self.cache_dir / f"{image_hash}_{model_loader.model_version}_{class_slug}.png"
+
+    def lookup(self, image_path: str, class_name: str) -> tuple[bytes, Path, Optional[bytes]]:
+        """Read an upload and its cache entry: (image bytes, cache path, cached PNG or None)"""
+        image_bytes = Path(image_path).read_bytes()
+        cache_path = self.cache_path(image_bytes, class_name)
+        cached = cache_path.read_bytes() if cache_path.exists() else None
+        return image_bytes, cache_path, cached
+
+    def compute(self, image_bytes: bytes, class_name: str, cache_path: Path) -> bytes:
+        """Run Grad-CAM, render the overlay and store it in the cache"""
+        image_tensor = preprocess_image(image_bytes)
+        cam, _ = model_loader.grad_cam(image_tensor, CLASS_NAMES.index(class_name))
+        png = render_overlay(image_bytes, cam)
+
+        # Write atomically so concurrent readers never see a partial file
+        tmp_path = cache_path.with_suffix(".tmp")
+        tmp_path.write_bytes(png)
+        os.replace(tmp_path, cache_path)
+
+        return png
+
+    async def explain(self, image_path: str, class_name: str) -> bytes:
+        """
+        Get the Grad-CAM overlay for an image, computing it if needed.
+
+        Args:
+            image_path: Path of the stored upload
+            class_name: Class whose evidence should be highlighted
+
+        Returns:
+            PNG bytes of the overlay
+
+        Raises:
+            ExplainerBusy: If the worker pool queue is full
+        """
+        # Reading and hashing a large upload would stall the event loop
+        image_bytes, cache_path, cached = await asyncio.to_thread(self.lookup, image_path, class_name)
+        if cached is not None:
+            return cached
+
+        # Identical concurrent requests share one computation
+        with self._lock:
+            future = self._pending.get(cache_path)
+            if future is None:
+                if len(self._pending) >= self.max_pending:
+                    raise ExplainerBusy()
+                future = self.executor.submit(self.compute, image_bytes, class_name, cache_path)
+                self._pending[cache_path] = future
+                submitted = True
+            else:
+                submitted = False
+
+        # Registered outside the lock: if the computation has already
+        # finished, the callback runs right here and takes the lock itself
+        if submitted:
+            future.add_done_callback(lambda _: self._forget(cache_path))
+
+        return await asyncio.wrap_future(future)
+
+    def _forget(self, cache_path: Path):
+        with self._lock:
+            self._pending.pop(cache_path, None)
+
+# Global explainer instance
+explainer = GradCAMExplainer()
@@ -1,10 +1,16 @@
 import google.generativeai as genai
 import os
+import json
 from dotenv import load_dotenv
 from pathlib import Path
 
+from shared_store import shared_store
+
 load_dotenv()
 
+# Chat histories expire after this long without a message
+CHAT_SESSION_TTL_SECONDS = int(os.getenv("CHAT_SESSION_TTL_SECONDS", "86400"))
+
 class GeminiChat:
     """Wrapper for Gemini 2.5 Flash model for conversational AI"""
     
@@ -36,7 +42,25 @@ Style: High-tech, clinical, supportive, and informative."""
         genai.configure(api_key=api_key)
         # Use gemini-2.5-flash - works better with free tier and is the latest model
         self.model = genai.GenerativeModel('models/gemini-2.5-flash')
-        self.chat_sessions = {}
+
+    def _save_session(self, session_id: str, chat):
+        """
+        Store a session's history in the shared store, so that any API
+        process can continue the conversation. Images are not stored; they
+        are replaced by a placeholder in later turns.
+        """
+        history = [
+            {"role": content.role, "parts": [part.text or "[image]" for part in content.parts]}
+            for content in chat.history
+        ]
+        shared_store.set(f"chat:{session_id}", json.dumps(history), CHAT_SESSION_TTL_SECONDS)
+
+    def _load_session(self, session_id: str):
+        """Rebuild a session from the shared store, or None if it has expired"""
+        data = shared_store.get(f"chat:{session_id}")
+        if data is None:
+            return None
+        return self.model.start_chat(history=json.loads(data))
 
     def start_chat(self, session_id: str, initial_context: str = None):
         """Start a new chat session with system prompt"""
@@ -49,15 +73,13 @@ Style: High-tech, clinical, supportive, and informative."""
             history.append({"role": "user", "parts": [initial_context]})
             history.append({"role": "model", "parts": ["I have received the vision model's technical analysis. I will now interpret these findings for you."]})
         
-        self.chat_sessions[session_id] = self.model.start_chat(history=history)
-        return self.chat_sessions[session_id]
+        chat = self.model.start_chat(history=history)
+        self._save_session(session_id, chat)
+        return chat
 
     def send_message(self, session_id: str, message: str, image_path: str = None):
         """Send a message and ensure disclaimer is appended"""
-        if session_id not in self.chat_sessions:
-            self.start_chat(session_id)
-        
-        chat = self.chat_sessions[session_id]
+        chat = self._load_session(session_id) or self.start_chat(session_id)
         
         if image_path and Path(image_path).exists():
             from PIL import Image
@@ -66,6 +88,7 @@ Style: High-tech, clinical, supportive, and informative."""
         else:
             response = chat.send_message(message)
         
+        self._save_session(session_id, chat)
         response_text = response.text
         
         # Core disclaimer text (without leading newlines) for checking presence
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Optional
+from pydantic import TypeAdapter
+from dotenv import load_dotenv
+
+from shared_store import shared_store, SharedStore
+from schemas import PredictionWithAnalysisResponse
+
+load_dotenv()
+
+# How long completed results are replayed
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "600"))
+
+class IdempotencyConflict(Exception):
+    """Raised when an Idempotency-Key is reused for a different request"""
+
+def request_fingerprint(content: bytes, **params) -> str:
+    """Hash of the uploaded content and every parameter that affects the result"""
+    digest = hashlib.sha256(content)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+class IdempotencyStore:
+    """
+    Coalesces identical in-flight requests and replays recent results.
+
+    The first request for a key starts the computation as its own task;
+    concurrent requests with the same key await that task instead of
+    starting another. With `replay`, successful results are also kept in
+    the shared store for `ttl` seconds, so retries are answered without
+    recomputing even when they reach a different API process. Failures
+    are not stored, so a retry after an error runs again.
+    """
+
+    def __init__(self, codec: TypeAdapter, store: SharedStore = shared_store, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.codec = codec
+        self.store = store
+        self.ttl = ttl
+        self._in_flight = {}
+
+    def _get_completed(self, key: str) -> Optional[tuple[str, Any]]:
+        data = self.store.get(f"idempotency:{key}")
+        if data is None:
+            return None
+        entry = json.loads(data)
+        return entry["fingerprint"], self.codec.validate_python(entry["value"])
+
+    def _store(self, key: str, fingerprint: str, value: Any):
+        entry = {"fingerprint": fingerprint, "value": self.codec.dump_python(value, mode="json")}
+        self.store.set(f"idempotency:{key}", json.dumps(entry), self.ttl)
+
+    async def run(self, key: str, fingerprint: str, compute: Callable[[], Awaitable[Any]], replay: bool = True) -> tuple[Any, bool]:
+        """
+        Get the result for a key, computing it at most once.
+
+        Args:
+            key: Namespaced key, e.g. the Idempotency-Key header value
+            fingerprint: Hash of the request (see request_fingerprint)
+            compute: Coroutine factory producing the result
+            replay: Store the result and return it to later requests with
+                the same key; otherwise it is only shared while in flight
+
+        Returns:
+            Tuple of (result, whether it was shared with another request)
+
+        Raises:
+            IdempotencyConflict: If the key was used for a different request
+        """
+        completed = await asyncio.to_thread(self._get_completed, key) if replay else None
+        if completed is not None:
+            if completed[0] != fingerprint:
+                raise IdempotencyConflict(key)
+            return completed[1], True
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            task, task_fingerprint = in_flight
+            if task_fingerprint != fingerprint:
+                raise IdempotencyConflict(key)
+            return await asyncio.shield(task), True
+
+        async def compute_and_store():
+            value = await compute()
+            if replay:
+                await asyncio.to_thread(self._store, key, fingerprint, value)
+            return value
+
+        # Run as a separate task so a disconnecting first client does not
+        # cancel the work other clients are waiting for
+        task = asyncio.ensure_future(compute_and_store())
+        self._in_flight[key] = (task, fingerprint)
+        task.add_done_callback(lambda task: self._in_flight.pop(key, None))
+        return await asyncio.shield(task), False
+
+# Global idempotency store for /predict results
+idempotency_store = IdempotencyStore(TypeAdapter(PredictionWithAnalysisResponse))
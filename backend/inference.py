@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+from dotenv import load_dotenv
+
+from model_loader import model_loader, TTA_CONFIDENCE_THRESHOLD
+from utils import preprocess_image
+from schemas import TTAInfo
+from job_queue import JobQueue
+
+load_dotenv()
+
+# How long an API process waits for a worker before answering 503
+INFERENCE_JOB_TIMEOUT = float(os.getenv("INFERENCE_JOB_TIMEOUT", "30"))
+
+def _tta_trigger(result: dict, tta: Optional[bool]) -> Optional[str]:
+    """Why test-time augmentation should run after a single pass, if at all"""
+    if tta is None and result["confidence"] < TTA_CONFIDENCE_THRESHOLD:
+        return "low_confidence"
+    return None
+
+def _run_tta(image_tensor: torch.Tensor, trigger: str, top_k: int) -> tuple[dict, TTAInfo]:
+    result = model_loader.predict_tta(image_tensor, top_k=top_k)
+    tta_info = TTAInfo(
+        trigger=trigger,
+        views=result["views"],
+        latency_ms=result["latency_ms"],
+        overhead_ratio=result["overhead_ratio"]
+    )
+    return result, tta_info
+
+def run_inference(image_bytes: bytes, tta: Optional[bool], top_k: int) -> tuple[dict, Optional[TTAInfo]]:
+    """
+    Decode and classify an upload. Blocking, so it runs off the event loop.
+
+    Args:
+        image_bytes: Raw image bytes from upload
+        tta: Test-time augmentation mode (see predict)
+        top_k: Number of most likely classes to include
+
+    Returns:
+        Tuple of (prediction result dict, TTA details or None)
+    """
+    image_tensor = preprocess_image(image_bytes)
+
+    # Use test-time augmentation if requested or if the single pass is
+    # not confident enough
+    if tta:
+        return _run_tta(image_tensor, "requested", top_k)
+
+    result = model_loader.predict_detailed(image_tensor, top_k)
+    trigger = _tta_trigger(result, tta)
+    if trigger:
+        return _run_tta(image_tensor, trigger, top_k)
+
+    return result, None
+
+def encode_job(image_bytes: bytes, tta: Optional[bool], top_k: int) -> dict:
+    """JSON payload of an inference job"""
+    return {"image": base64.b64encode(image_bytes).decode("ascii"), "tta": tta, "top_k": top_k}
+
+def encode_result(result: dict, tta_info: Optional[TTAInfo]) -> dict:
+    """JSON form of run_inference's return value"""
+    return {
+        "result": {**result, "probabilities": result["probabilities"].tolist()},
+        "tta": tta_info.model_dump() if tta_info else None,
+    }
+
+def decode_result(data: dict) -> tuple[dict, Optional[TTAInfo]]:
+    """Inverse of encode_result"""
+    result = {**data["result"], "probabilities": np.asarray(data["result"]["probabilities"], dtype=np.float32)}
+    tta_info = TTAInfo(**data["tta"]) if data["tta"] else None
+    return result, tta_info
+
+def run_inference_batch(jobs: list[dict]) -> list:
+    """
+    Classify a batch of queued jobs (see encode_job) in one forward pass.
+
+    Jobs that request TTA, or whose single-pass confidence triggers it,
+    are then re-run individually with TTA. A job whose image cannot be
+    decoded fails alone without affecting the rest of the batch.
+
+    Returns:
+        One encoded result (see encode_result) or Exception per job
+    """
+    results = [None] * len(jobs)
+    tensors = {}
+    for i, job in enumerate(jobs):
+        try:
+            tensors[i] = preprocess_image(base64.b64decode(job["image"]))
+        except Exception as e:
+            results[i] = e
+
+    single = [i for i in tensors if not jobs[i]["tta"]]
+    if single:
+        top_k = max(jobs[i]["top_k"] for i in single)
+        batch = torch.cat([tensors[i] for i in single])
+        for i, result in zip(single, model_loader.predict_batch(batch, top_k)):
+            result["top_k"] = result["top_k"][:jobs[i]["top_k"]]
+            trigger = _tta_trigger(result, jobs[i]["tta"])
+            if trigger:
+                results[i] = encode_result(*_run_tta(tensors[i], trigger, jobs[i]["top_k"]))
+            else:
+                results[i] = encode_result(result, None)
+
+    for i in tensors:
+        if jobs[i]["tta"]:
+            results[i] = encode_result(*_run_tta(tensors[i], "requested", jobs[i]["top_k"]))
+
+    return results
+
+async def run_inference_remote(queue: JobQueue, image_bytes: bytes, tta: Optional[bool], top_k: int, priority: int) -> tuple[dict, Optional[TTAInfo]]:
+    """
+    Classify an upload on an inference worker (see worker.py).
+
+    Raises:
+        JobFailed: If the worker could not classify the image
+        TimeoutError: If no worker finished it within INFERENCE_JOB_TIMEOUT
+    """
+    job_id = await asyncio.to_thread(queue.enqueue, encode_job(image_bytes, tta, top_k), priority)
+    return decode_result(await queue.wait(job_id, INFERENCE_JOB_TIMEOUT))
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory://" (single process) or "sqlite:///path/to/jobs.db" (shared between
+# local processes)
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "memory://")
+# A claimed job not finished within this many seconds is handed to another worker
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs nobody collected are purged after this many seconds
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class JobFailed(Exception):
+    """Raised when waiting on a job that failed"""
+
+class JobQueue(ABC):
+    """
+    Interface between API front-ends and inference workers.
+
+    Jobs carry a JSON-serializable payload and are claimed in batches, lower
+    priority values first. Implementations for an external broker (Redis,
+    RabbitMQ, SQS, ...) provide the same methods: `enqueue` publishes,
+    `claim_batch` receives up to N messages with a visibility timeout,
+    `complete`/`fail` store the outcome where `get` can read it, and
+    `delete` acknowledges it.
+    """
+
+    poll_interval = 0.02
+
+    @abstractmethod
+    def enqueue(self, payload: dict, priority: int = 0) -> str:
+        ...
+
+    @abstractmethod
+    def claim_batch(self, max_jobs: int) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, result: dict):
+        ...
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        ...
+
+    async def wait(self, job_id: str, timeout: float) -> dict:
+        """
+        Wait for a job to finish and remove it from the queue.
+
+        Returns:
+            The job's result
+
+        Raises:
+            JobFailed: If the job failed
+            TimeoutError: If it did not finish within `timeout` seconds
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = await asyncio.to_thread(self.get, job_id)
+            if job is not None and job["status"] in (DONE, FAILED):
+                await asyncio.to_thread(self.delete, job_id)
+                if job["status"] == FAILED:
+                    raise JobFailed(job["error"])
+                return job["result"]
+            await asyncio.sleep(self.poll_interval)
+
+        # Nobody will read the result, so spare the workers if it is still queued
+        await asyncio.to_thread(self.delete, job_id)
+        raise TimeoutError(f"Job {job_id} did not finish within {timeout}s")
+
+class InProcessJobQueue(JobQueue):
+    """Job queue held in memory, for workers running in the same process"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload: dict, priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {"id": job_id, "payload": payload, "status": QUEUED, "result": None, "error": None}
+            self._queues.setdefault(priority, deque()).append(job_id)
+        return job_id
+
+    def claim_batch(self, max_jobs: int) -> list[dict]:
+        claimed = []
+        with self._lock:
+            for priority in sorted(self._queues):
+                queue = self._queues[priority]
+                while queue and len(claimed) < max_jobs:
+                    job = self._jobs.get(queue.popleft())
+                    if job is not None:
+                        job["status"] = RUNNING
+                        claimed.append(dict(job))
+        return claimed
+
+    def complete(self, job_id: str, result: dict):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(status=DONE, result=result)
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(status=FAILED, error=error)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in a SQLite file, shared by API and worker processes on one
+    machine.
+
+    Claiming runs in a write transaction, so concurrent workers never get
+    the same job. Jobs whose worker died are requeued after
+    JOB_VISIBILITY_TIMEOUT, up to JOB_MAX_ATTEMPTS times.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                claimed_at REAL,
+                finished_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_claim ON jobs (status, priority, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, payload: dict, priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO jobs (id, priority, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, priority, QUEUED, json.dumps(payload), time.time())
+        )
+        return job_id
+
+    def claim_batch(self, max_jobs: int) -> list[dict]:
+        conn = self._connect()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Give up on jobs that keep timing out, requeue the others
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = 'worker timed out', finished_at = ? "
+                "WHERE status = ? AND claimed_at < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now - JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, claimed_at = NULL WHERE status = ? AND claimed_at < ?",
+                (QUEUED, RUNNING, now - JOB_VISIBILITY_TIMEOUT)
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, now - JOB_RESULT_TTL)
+            )
+
+            rows = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = ? ORDER BY priority, created_at LIMIT ?",
+                (QUEUED, max_jobs)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(RUNNING, now, job_id) for job_id, _ in rows]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        return [{"id": job_id, "payload": json.loads(payload), "status": RUNNING} for job_id, payload in rows]
+
+    def complete(self, job_id: str, result: dict):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+            (FAILED, error, time.time(), job_id)
+        )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connect().execute(
+            "SELECT status, result, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, result, error = row
+        return {"id": job_id, "status": status, "result": json.loads(result) if result else None, "error": error}
+
+    def delete(self, job_id: str):
+        self._connect().execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+def get_job_queue(url: str = JOB_QUEUE_URL) -> JobQueue:
+    """Create the job queue described by a URL"""
+    if url.startswith("memory://"):
+        return InProcessJobQueue()
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported job queue URL: {url}")
+
+def serve_jobs(queue: JobQueue, handler: Callable[[list[dict]], list], batch_size: int, poll_interval: float = 0.05, stop_event: threading.Event = None):
+    """
+    Worker loop: claim batches of jobs and process them together.
+
+    Args:
+        queue: Queue to pull from
+        handler: Called with the batch's payloads; returns one result dict
+            (or Exception) per payload, in order
+        batch_size: Maximum jobs per batch
+        poll_interval: Sleep between polls while the queue is empty
+        stop_event: Stops the loop when set
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        jobs = queue.claim_batch(batch_size)
+        if not jobs:
+            stop_event.wait(poll_interval)
+            continue
+
+        try:
+            results = handler([job["payload"] for job in jobs])
+        except Exception as e:
+            results = [e] * len(jobs)
+
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                queue.fail(job["id"], str(result))
+            else:
+                queue.complete(job["id"], result)
@@ -1,44 +1,171 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Query, Response, Request, BackgroundTasks, Header
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from datetime import datetime
+from pydantic import TypeAdapter
+from typing import Optional
+import hashlib
+from datetime import datetime, date
 import os
 import shutil
 from pathlib import Path
+from PIL import UnidentifiedImageError
 
-from database import get_db, init_db, ClassificationRecord
-from model_loader import model_loader
-from utils import preprocess_image
-from schemas import PredictionResponse, HistoryRecord, ChatMessage, ChatResponse, PredictionWithAnalysisResponse
+from database import get_db, init_db, SessionLocal, ClassificationRecord
+from stats import record_classification, ensure_stats_backfilled, get_stats
+from model_loader import model_loader, DEFAULT_TOP_K, CLASS_NAMES
+from utils import encode_float16
+from schemas import TTAInfo, PredictionResponse, HistoryRecord, ChatMessage, ChatResponse, PredictionWithAnalysisResponse, StatsResponse, ModelLoadRequest, ModelRegistryResponse
+from inference import run_inference, run_inference_remote
+from job_queue import get_job_queue, JOB_QUEUE_URL
 from gemini_chat import gemini_chat
+from explain import explainer, ExplainerBusy
+from admission import admission, AdmissionRejected, PRIORITIES
+from thumbnails import THUMBNAIL_SIZES, THUMBNAIL_MEDIA_TYPE, generate_thumbnails, ensure_thumbnail, file_etag
+from maintenance import maintenance_job, tombstone
+from idempotency import idempotency_store, request_fingerprint, IdempotencyConflict
+from validation import validate_image, ImageRejected, MAX_UPLOAD_BYTES
+from compression import CompressionMiddleware
+from static_assets import init_frontend
 import uuid
 
+try:
+    import orjson  # noqa: F401 -- enables the faster ORJSONResponse
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    DefaultJSONResponse = JSONResponse
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Atifsiddiqui - Skin Lesion Classification API",
     description="Backend API for skin cancer detection using EfficientNet",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultJSONResponse
 )
 
-# Configure CORS
+# Compress large JSON responses (Brotli or gzip)
+if os.getenv("COMPRESSION_ENABLED", "true").lower() == "true":
+    app.add_middleware(CompressionMiddleware)
+
+# Optionally serve the frontend at /app with fingerprinted, long-cached assets
+if os.getenv("SERVE_FRONTEND", "false").lower() == "true":
+    app.include_router(init_frontend())
+
+# Create uploads directory
+UPLOAD_DIR = Path("./uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# Generate thumbnails in the background right after upload (otherwise lazily)
+THUMBNAILS_ON_UPLOAD = os.getenv("THUMBNAILS_ON_UPLOAD", "true").lower() == "true"
+IMAGE_CACHE_CONTROL = "private, max-age=86400"
+# History and stats change with every prediction, so clients revalidate
+LIST_CACHE_CONTROL = "private, no-cache"
+
+HISTORY_ADAPTER = TypeAdapter(list[HistoryRecord])
+STATS_ADAPTER = TypeAdapter(StatsResponse)
+
+# Retention, archival and VACUUM run in a background thread (see maintenance.py)
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+
+# Room for multipart boundaries and headers around the image itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# "standalone" runs inference in this process; "api" hands it to inference
+# workers (worker.py) through the job queue and never loads the model
+DEPLOYMENT_MODE = os.getenv("DEPLOYMENT_MODE", "standalone")
+if DEPLOYMENT_MODE not in ("standalone", "api"):
+    raise ValueError(f"Unknown DEPLOYMENT_MODE: {DEPLOYMENT_MODE}")
+# Workers run in their own processes, so they cannot reach an in-memory queue
+if DEPLOYMENT_MODE == "api" and JOB_QUEUE_URL.startswith("memory://"):
+    raise ValueError("DEPLOYMENT_MODE=api needs a JOB_QUEUE_URL shared with the workers, e.g. sqlite:///./jobs.db")
+job_queue = get_job_queue() if DEPLOYMENT_MODE == "api" else None
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Tell overloaded clients to back off instead of queueing indefinitely"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": f"Server busy ({exc.stage}: {exc.reason}), please retry later"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.middleware("http")
+async def admit_uploads(request: Request, call_next):
+    """
+    Bound the number of /predict requests in progress.
+    
+    Runs before the multipart body is read, so uploads waiting for
+    admission are not buffered in memory, and uploads that announce a
+    size over MAX_UPLOAD_BYTES are refused without reading them at all.
+    """
+    if request.method != "POST" or request.url.path != "/predict":
+        return await call_next(request)
+    
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        return JSONResponse(status_code=413, content={"detail": f"Image exceeds {MAX_UPLOAD_BYTES} bytes"})
+    
+    priority = PRIORITIES.get(request.headers.get("x-request-priority"), PRIORITIES["interactive"])
+    try:
+        async with admission.slot("ingest", priority):
+            return await call_next(request)
+    except AdmissionRejected as exc:
+        return await admission_rejected_handler(request, exc)
+
+# Configure CORS. Added last so it wraps every other layer, and the 413/429
+# responses from admit_uploads still reach cross-origin clients
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # In production, specify exact origins
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-# Create uploads directory
-UPLOAD_DIR = Path("./uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    ensure_stats_backfilled()
     print("Database initialized successfully")
-    print("Model loaded and ready for predictions")
+    
+    if DEPLOYMENT_MODE == "standalone":
+        model_loader.ensure_loaded()
+        print("Model loaded and ready for predictions")
+    else:
+        print("API mode: predictions are handled by inference workers")
+    
+    if MAINTENANCE_ENABLED:
+        maintenance_job.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background maintenance"""
+    maintenance_job.stop()
+
+def revalidated_json(request: Request, body: bytes) -> Response:
+    """JSON response with an ETag, answering 304 if the client's copy is current"""
+    etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def get_live_record(db: Session, record_id: int) -> ClassificationRecord:
+    """Fetch a record that has not been deleted, or raise 404"""
+    record = db.query(ClassificationRecord)\
+        .filter(ClassificationRecord.id == record_id)\
+        .filter(ClassificationRecord.deleted_at.is_(None))\
+        .first()
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="Record not found")
+    
+    return record
 
 @app.get("/")
 async def root():
@@ -46,99 +173,242 @@ async def root():
     return {
         "message": "Atifsiddiqui API is running",
         "status": "healthy",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "deployment_mode": DEPLOYMENT_MODE,
+        "admission": admission.snapshot()
     }
 
+async def infer_upload(image_bytes: bytes, tta: Optional[bool], top_k: int, priority: int) -> tuple[dict, Optional[TTAInfo]]:
+    """
+    Classify an upload, here or on an inference worker.
+    
+    Identical uploads in flight at the same time share one forward pass.
+    Nothing is kept afterwards, and the key includes the active model
+    version, so a result is never reused across a model swap.
+    """
+    fingerprint = request_fingerprint(image_bytes, tta=tta, top_k=top_k)
+    # In API mode the version is only known to the workers
+    model_version = model_loader.model_version if job_queue is None else "workers"
+    
+    async def compute():
+        async with admission.slot("inference", priority):
+            if job_queue is not None:
+                try:
+                    return await run_inference_remote(job_queue, image_bytes, tta, top_k, priority)
+                except TimeoutError:
+                    raise AdmissionRejected("inference", 503, 5, "no worker available")
+            return await run_in_threadpool(run_inference, image_bytes, tta, top_k)
+    
+    (result, tta_info), _ = await idempotency_store.run(
+        f"inference:{model_version}:{fingerprint}",
+        fingerprint,
+        compute,
+        replay=False
+    )
+    return result, tta_info
+
+async def classify_upload(
+    image_bytes: bytes,
+    original_filename: str,
+    tta: Optional[bool],
+    top_k: int,
+    include_probabilities: bool,
+    probability_dtype: str,
+    priority: int,
+    background_tasks: BackgroundTasks
+) -> PredictionWithAnalysisResponse:
+    """
+    Classify an upload, save it to history and get the Gemini analysis.
+    
+    Uses its own database session, since the result may be shared by
+    retries with the same Idempotency-Key and outlive the request that
+    started it.
+    """
+    result, tta_info = await infer_upload(image_bytes, tta, top_k, priority)
+    
+    # Save uploaded image only once it has been classified
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{timestamp}_{original_filename}"
+    file_path = UPLOAD_DIR / filename
+    
+    with open(file_path, "wb") as f:
+        f.write(image_bytes)
+    
+    predicted_class = result["prediction"]
+    confidence = result["confidence"]
+    
+    probabilities = None
+    probabilities_float16 = None
+    if include_probabilities:
+        if probability_dtype == "float16":
+            probabilities_float16 = encode_float16(result["probabilities"])
+        else:
+            probabilities = dict(zip(CLASS_NAMES, result["probabilities"].tolist()))
+    
+    # Determine severity (simplified logic for now)
+    high_risk_classes = ["Melanoma", "Basal cell carcinoma", "Squamous cell carcinoma"]
+    severity_level = "high" if predicted_class in high_risk_classes else "low"
+    
+    # Generate unique session ID for potential follow-up chat
+    session_id = str(uuid.uuid4())
+    
+    # Save to database
+    db = SessionLocal()
+    try:
+        record = ClassificationRecord(
+            image_path=str(file_path),
+            prediction=predicted_class,
+            confidence=confidence,
+            timestamp=datetime.utcnow(),
+            model_version=result["model_version"]
+        )
+        db.add(record)
+        record_classification(db, record)
+        db.commit()
+        db.refresh(record)
+    finally:
+        db.close()
+    
+    if THUMBNAILS_ON_UPLOAD:
+        background_tasks.add_task(generate_thumbnails, str(file_path))
+    
+    # Provide simple recommendation based on severity
+    if severity_level == "high":
+        recommendation = f"The model detected {predicted_class} with {confidence:.1%} confidence. This is classified as a high-risk condition. Please consult a dermatologist for professional evaluation."
+    else:
+        recommendation = f"The model detected {predicted_class} with {confidence:.1%} confidence. This appears to be a low-risk condition, but consulting a dermatologist is recommended for proper diagnosis."
+    
+    # Create the model response object
+    model_resp = PredictionResponse(
+        prediction=predicted_class,
+        confidence=confidence,
+        severity_level=severity_level,
+        recommendation=recommendation,
+        timestamp=record.timestamp,
+        session_id=session_id,
+        model_version=result["model_version"],
+        top_k=result["top_k"],
+        probabilities=probabilities,
+        probabilities_float16=probabilities_float16,
+        tta=tta_info
+    )
+
+    # Get Gemini interpretation of the text result. The prediction is
+    # already saved, so if the LLM is overloaded fall back to the plain
+    # recommendation rather than failing the request.
+    try:
+        async with admission.slot("llm", priority):
+            gemini_analysis = await run_in_threadpool(
+                gemini_chat.get_analysis_interpretation,
+                session_id=session_id,
+                prediction=predicted_class,
+                confidence=confidence
+            )
+    except AdmissionRejected:
+        gemini_analysis = f"{recommendation} (Detailed AI analysis is temporarily unavailable due to high demand.)"
+    
+    return PredictionWithAnalysisResponse(
+        gemini_analysis=gemini_analysis,
+        model_response=model_resp,
+        session_id=session_id,
+        timestamp=record.timestamp
+    )
+
 @app.post("/predict", response_model=PredictionWithAnalysisResponse)
 async def predict(
+    response: Response,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    tta: Optional[bool] = None,
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=len(CLASS_NAMES)),
+    include_probabilities: bool = False,
+    probability_dtype: str = Query("float32", pattern="^(float32|float16)$"),
+    x_request_priority: str = Header("interactive", pattern=f"^({'|'.join(PRIORITIES)})$"),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Predict skin lesion type from uploaded image.
     
+    Requests carrying the same Idempotency-Key share one result, replayed
+    for IDEMPOTENCY_TTL_SECONDS, so client retries do not create duplicate
+    records or Gemini calls. Without a key, identical uploads in flight at
+    the same time share only the forward pass; each still gets its own
+    record, chat session and analysis.
+    
     Args:
+        response: Outgoing response (for the Idempotent-Replayed header)
+        background_tasks: Runs thumbnail generation after the response
         file: Uploaded image file
-        db: Database session
+        tta: Force test-time augmentation on (true) or off (false). When
+            omitted, TTA runs only if single-pass confidence is below
+            TTA_CONFIDENCE_THRESHOLD.
+        top_k: Number of most likely classes to include in the differential
+        include_probabilities: Include the full probability vector
+        probability_dtype: "float32" returns probabilities as a class-name
+            mapping, "float16" as base64 float16 bytes in CLASS_NAMES order
+        x_request_priority: "interactive" uploads are admitted ahead of
+            "batch" scoring when the server is under load
+        idempotency_key: Client-chosen key identifying retries of one request
         
     Returns:
         Prediction result with class name and confidence
+        
+    Raises:
+        HTTPException: 400/413/415 when the upload is not an acceptable
+            image (see validation.py)
+        AdmissionRejected: When a pipeline stage is over capacity (429/503)
     """
     try:
         # Validate file type
         if not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Read image bytes
-        image_bytes = await file.read()
-        
-        # Save uploaded image
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        file_path = UPLOAD_DIR / filename
-        
-        with open(file_path, "wb") as f:
-            f.write(image_bytes)
-        
-        # Preprocess image
-        image_tensor = preprocess_image(image_bytes)
-        
-        # Make prediction
-        predicted_class, confidence = model_loader.predict(image_tensor)
+        priority = PRIORITIES[x_request_priority]
         
-        # Determine severity (simplified logic for now)
-        high_risk_classes = ["Melanoma", "Basal cell carcinoma", "Squamous cell carcinoma"]
-        severity_level = "high" if predicted_class in high_risk_classes else "low"
+        # Read image bytes (one byte over the limit is enough to reject)
+        # and check the header before anything decodes the pixels
+        image_bytes = await file.read(MAX_UPLOAD_BYTES + 1)
+        validate_image(image_bytes)
         
-        # Generate unique session ID for potential follow-up chat
-        session_id = str(uuid.uuid4())
-        
-        # Save to database
-        record = ClassificationRecord(
-            image_path=str(file_path),
-            prediction=predicted_class,
-            confidence=confidence,
-            timestamp=datetime.utcnow()
+        classify = lambda: classify_upload(
+            image_bytes,
+            file.filename,
+            tta,
+            top_k,
+            include_probabilities,
+            probability_dtype,
+            priority,
+            background_tasks
         )
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+        if not idempotency_key:
+            return await classify()
         
-        # Provide simple recommendation based on severity
-        if severity_level == "high":
-            recommendation = f"The model detected {predicted_class} with {confidence:.1%} confidence. This is classified as a high-risk condition. Please consult a dermatologist for professional evaluation."
-        else:
-            recommendation = f"The model detected {predicted_class} with {confidence:.1%} confidence. This appears to be a low-risk condition, but consulting a dermatologist is recommended for proper diagnosis."
-        
-        # Create the model response object
-        model_resp = PredictionResponse(
-            prediction=predicted_class,
-            confidence=confidence,
-            severity_level=severity_level,
-            recommendation=recommendation,
-            timestamp=record.timestamp,
-            session_id=session_id
-        )
-
-        # Get Gemini interpretation of the text result
-        gemini_analysis = gemini_chat.get_analysis_interpretation(
-            session_id=session_id,
-            prediction=predicted_class,
-            confidence=confidence
+        fingerprint = request_fingerprint(
+            image_bytes,
+            tta=tta,
+            top_k=top_k,
+            include_probabilities=include_probabilities,
+            probability_dtype=probability_dtype
         )
+        prediction, shared = await idempotency_store.run(f"key:{idempotency_key}", fingerprint, classify)
         
-        return PredictionWithAnalysisResponse(
-            gemini_analysis=gemini_analysis,
-            model_response=model_resp,
-            session_id=session_id,
-            timestamp=record.timestamp
-        )
+        if shared:
+            response.headers["Idempotent-Replayed"] = "true"
+        
+        return prediction
         
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    except (HTTPException, AdmissionRejected):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 @app.get("/history", response_model=list[HistoryRecord])
 async def get_history(
+    request: Request,
     limit: int = 10,
     db: Session = Depends(get_db)
 ):
@@ -146,39 +416,194 @@ async def get_history(
     Get classification history.
     
     Args:
+        request: Incoming request (for If-None-Match)
         limit: Maximum number of records to return
         db: Database session
         
     Returns:
-        List of classification records
+        List of classification records, serialized straight to JSON bytes
+        by pydantic-core
     """
     records = db.query(ClassificationRecord)\
+        .filter(ClassificationRecord.deleted_at.is_(None))\
         .order_by(ClassificationRecord.timestamp.desc())\
         .limit(limit)\
         .all()
     
-    return records
+    history = HISTORY_ADAPTER.validate_python(records, from_attributes=True)
+    return revalidated_json(request, HISTORY_ADAPTER.dump_json(history))
 
 @app.delete("/history/{record_id}")
 async def delete_history_record(
     record_id: int,
     db: Session = Depends(get_db)
 ):
-    """Delete a specific history record"""
-    record = db.query(ClassificationRecord).filter(ClassificationRecord.id == record_id).first()
-    
-    if not record:
-        raise HTTPException(status_code=404, detail="Record not found")
+    """
+    Delete a specific history record.
     
-    # Delete associated image file if exists
-    if os.path.exists(record.image_path):
-        os.remove(record.image_path)
+    The record is only tombstoned here; the maintenance job removes the
+    row and its image files later, off the request path.
+    """
+    record = get_live_record(db, record_id)
     
-    db.delete(record)
+    tombstone(db, record)
     db.commit()
     
     return {"message": "Record deleted successfully"}
 
+@app.get("/images/{record_id}")
+async def get_record_image(
+    record_id: int,
+    request: Request,
+    size: str = Query("medium", pattern=f"^(original|{'|'.join(THUMBNAIL_SIZES)})$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Serve the image of a history record, optionally as a thumbnail.
+    
+    Args:
+        record_id: ID of the classification record
+        request: Incoming request (for If-None-Match)
+        size: "original" or one of the thumbnail sizes
+        db: Database session
+        
+    Returns:
+        The image file, or 304 Not Modified if the client's copy is current
+    """
+    record = get_live_record(db, record_id)
+    
+    if not os.path.exists(record.image_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    if size == "original":
+        path = Path(record.image_path)
+        media_type = None
+    else:
+        path = await run_in_threadpool(ensure_thumbnail, record.image_path, size)
+        media_type = THUMBNAIL_MEDIA_TYPE
+    
+    etag = file_etag(path)
+    headers = {"ETag": etag, "Cache-Control": IMAGE_CACHE_CONTROL}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in client_etags or "*" in client_etags:
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+def require_local_model():
+    """The model is only loaded by the inference workers in API mode"""
+    if DEPLOYMENT_MODE == "api":
+        raise HTTPException(status_code=409, detail="The model runs on the inference workers in API mode")
+
+@app.get("/explain/{record_id}", dependencies=[Depends(require_local_model)])
+async def explain_record(
+    record_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a Grad-CAM heatmap showing which regions drove a prediction.
+    
+    Args:
+        record_id: ID of the classification record
+        db: Database session
+        
+    Returns:
+        PNG overlay of the heatmap on the stored image
+    """
+    record = get_live_record(db, record_id)
+    
+    if not os.path.exists(record.image_path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    if record.prediction not in CLASS_NAMES:
+        raise HTTPException(status_code=422, detail=f"Unknown class: {record.prediction}")
+    
+    try:
+        png = await explainer.explain(record.image_path, record.prediction)
+    except ExplainerBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Explanation queue is full, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=422, detail="Stored image could not be read")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
+    
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
+
+@app.get("/stats", response_model=StatsResponse)
+async def get_classification_stats(
+    request: Request,
+    start_date: date = None,
+    end_date: date = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get class distribution, confidence histogram and daily volume.
+    
+    Args:
+        request: Incoming request (for If-None-Match)
+        start_date: First day to include (inclusive, UTC)
+        end_date: Last day to include (inclusive, UTC)
+        db: Database session
+        
+    Returns:
+        Aggregated statistics read from the rollup table
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    stats = STATS_ADAPTER.validate_python(get_stats(db, start_date, end_date))
+    return revalidated_json(request, STATS_ADAPTER.dump_json(stats))
+
+@app.get("/models", response_model=ModelRegistryResponse, dependencies=[Depends(require_local_model)])
+async def get_models():
+    """Get the active and candidate model versions with latency/agreement stats"""
+    return model_loader.status()
+
+@app.post("/models/load", status_code=202, dependencies=[Depends(require_local_model)])
+async def load_model(request: ModelLoadRequest):
+    """
+    Load a new model version in the background.
+    
+    Args:
+        request: Weights path (inside MODEL_DIR), optional version label,
+            whether to activate it once warmed up, and otherwise the
+            fraction of traffic to shadow-score on it
+        
+    Returns:
+        Label to follow in GET /models while loading
+    """
+    try:
+        label = model_loader.load_version(
+            request.path,
+            version=request.version,
+            activate=request.activate,
+            shadow_fraction=request.shadow_fraction
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"message": "Model loading started", "label": label}
+
+@app.post("/models/{version}/activate", dependencies=[Depends(require_local_model)])
+async def activate_model(version: str):
+    """Promote the candidate model version to active without a restart"""
+    try:
+        model_loader.activate_candidate(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {"message": f"Model version {version} is now active"}
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_message: ChatMessage
@@ -199,10 +624,12 @@ async def chat(
             session_id = str(uuid.uuid4())
             
         # Send message to Gemini
-        response_text = gemini_chat.send_message(
-            session_id=session_id,
-            message=chat_message.message
-        )
+        async with admission.slot("llm"):
+            response_text = await run_in_threadpool(
+                gemini_chat.send_message,
+                session_id=session_id,
+                message=chat_message.message
+            )
         
         return ChatResponse(
             response=response_text,
@@ -210,6 +637,8 @@ async def chat(
             session_id=session_id
         )
         
+    except AdmissionRejected:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
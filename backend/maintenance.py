@@ -0,0 +1,275 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from PIL import Image
+from dotenv import load_dotenv
+
+from database import SessionLocal, engine, ClassificationRecord
+from stats import remove_classification
+from thumbnails import remove_thumbnails
+from explain import EXPLAIN_CACHE_DIR
+from admission import admission
+
+load_dotenv()
+
+# Records older than this are deleted with their images (0 keeps them forever)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "0"))
+# Uploads older than this are moved into the archive (0, the default,
+# disables archival)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "./uploads/archive"))
+
+# Modes that lossless WebP stores exactly (after widening L/LA to RGB/RGBA)
+LOSSLESS_WEBP_MODES = {"L": "RGB", "LA": "RGBA", "RGB": "RGB", "RGBA": "RGBA"}
+
+MAINTENANCE_INTERVAL_SECONDS = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+VACUUM_INTERVAL_HOURS = int(os.getenv("VACUUM_INTERVAL_HOURS", "24"))
+# Throttling: rows per batch, pause between batches, and how long a batch
+# may be held back while /predict requests are in flight
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "100"))
+MAINTENANCE_BATCH_PAUSE = float(os.getenv("MAINTENANCE_BATCH_PAUSE", "0.5"))
+MAINTENANCE_MAX_IDLE_WAIT = float(os.getenv("MAINTENANCE_MAX_IDLE_WAIT", "30"))
+
+def tombstone(db, record: ClassificationRecord):
+    """Mark a record as deleted and drop it from the stats (caller commits)"""
+    record.deleted_at = datetime.utcnow()
+    remove_classification(db, record)
+
+def remove_explanations(image_bytes: bytes):
+    """Delete cached Grad-CAM overlays of an image (keyed by its content hash)"""
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    for cached in EXPLAIN_CACHE_DIR.glob(f"{image_hash}_*.png"):
+        cached.unlink(missing_ok=True)
+
+def remove_image_files(image_path: str):
+    """Delete an upload together with its thumbnails and cached explanations"""
+    path = Path(image_path)
+    if path.exists():
+        remove_explanations(path.read_bytes())
+        path.unlink(missing_ok=True)
+    remove_thumbnails(image_path)
+
+def archive_image(image_path: str) -> str:
+    """
+    Move an upload into the archive without losing any image data.
+
+    The image is re-encoded as lossless WebP at its original resolution,
+    keeping its EXIF and ICC metadata. If that is not smaller (typical for
+    JPEG photos), or the mode cannot be stored exactly, the original bytes
+    are moved instead. Thumbnails and cached explanations keyed by the old
+    file are removed; they are regenerated from the archived copy on demand.
+
+    Returns:
+        Path of the archived image
+    """
+    source = Path(image_path)
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    source_bytes = source.read_bytes()
+
+    target = ARCHIVE_DIR / f"{source.name}.webp"
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    with Image.open(source) as image:
+        mode = LOSSLESS_WEBP_MODES.get(image.mode)
+        if mode is not None and not getattr(image, "is_animated", False):
+            try:
+                image.convert(mode).save(
+                    tmp_path,
+                    format="WEBP",
+                    lossless=True,
+                    method=6,
+                    exif=image.info.get("exif", b""),
+                    icc_profile=image.info.get("icc_profile")
+                )
+            except (OSError, ValueError):
+                pass  # e.g. larger than WebP's 16383 px limit
+
+    if tmp_path.exists() and tmp_path.stat().st_size < len(source_bytes):
+        os.replace(tmp_path, target)
+        source.unlink()
+    else:
+        tmp_path.unlink(missing_ok=True)
+        target = ARCHIVE_DIR / source.name
+        os.replace(source, target)
+
+    remove_thumbnails(image_path)
+    remove_explanations(source_bytes)
+    return str(target)
+
+class MaintenanceJob:
+    """
+    Background retention, compaction and database upkeep.
+
+    Runs in a daemon thread and works in small batches, pausing between
+    them and while /predict requests are in flight, so it stays out of the
+    way of live traffic.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_vacuum = time.monotonic()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def _run(self):
+        while not self._stop.wait(MAINTENANCE_INTERVAL_SECONDS):
+            try:
+                summary = self.run_once()
+                if any(summary.values()):
+                    print(f"Maintenance: {summary}")
+            except Exception as e:
+                print(f"Maintenance failed: {e}")
+
+    def _throttle(self):
+        """Pause between batches, and hold off while uploads are in flight"""
+        self._stop.wait(MAINTENANCE_BATCH_PAUSE)
+        self._wait_for_idle()
+
+    def _wait_for_idle(self) -> bool:
+        """Wait up to MAINTENANCE_MAX_IDLE_WAIT for uploads to finish; True if they did"""
+        deadline = time.monotonic() + MAINTENANCE_MAX_IDLE_WAIT
+        while admission.stages["ingest"].in_flight:
+            if time.monotonic() >= deadline or self._stop.wait(0.1):
+                return False
+        return True
+
+    def run_once(self) -> dict:
+        """Run every maintenance task once and return what was done"""
+        summary = {
+            "expired": self.expire_records(),
+            "purged": self.purge_tombstones(),
+            "archived": self.archive_uploads(),
+            "vacuumed": False,
+        }
+
+        if time.monotonic() - self._last_vacuum >= VACUUM_INTERVAL_HOURS * 3600:
+            summary["vacuumed"] = self.vacuum()
+
+        return summary
+
+    def expire_records(self) -> int:
+        """Tombstone records older than the retention period"""
+        if not RETENTION_DAYS:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+        expired = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                records = db.query(ClassificationRecord)\
+                    .filter(ClassificationRecord.deleted_at.is_(None))\
+                    .filter(ClassificationRecord.timestamp < cutoff)\
+                    .limit(MAINTENANCE_BATCH_SIZE)\
+                    .all()
+                for record in records:
+                    tombstone(db, record)
+                db.commit()
+            finally:
+                db.close()
+
+            expired += len(records)
+            if len(records) < MAINTENANCE_BATCH_SIZE:
+                break
+            self._throttle()
+
+        return expired
+
+    def purge_tombstones(self) -> int:
+        """Delete tombstoned rows and their image files in batches"""
+        purged = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                records = db.query(ClassificationRecord.id, ClassificationRecord.image_path)\
+                    .filter(ClassificationRecord.deleted_at.isnot(None))\
+                    .limit(MAINTENANCE_BATCH_SIZE)\
+                    .all()
+                for _, image_path in records:
+                    remove_image_files(image_path)
+
+                ids = [record_id for record_id, _ in records]
+                if ids:
+                    db.query(ClassificationRecord)\
+                        .filter(ClassificationRecord.id.in_(ids))\
+                        .delete(synchronize_session=False)
+                    db.commit()
+            finally:
+                db.close()
+
+            purged += len(records)
+            if len(records) < MAINTENANCE_BATCH_SIZE:
+                break
+            self._throttle()
+
+        return purged
+
+    def archive_uploads(self) -> int:
+        """Compact full-resolution uploads older than ARCHIVE_AFTER_DAYS"""
+        if not ARCHIVE_AFTER_DAYS:
+            return 0
+
+        cutoff = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        archive_prefix = str(ARCHIVE_DIR) + os.sep
+        archived = 0
+        last_id = 0
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                records = db.query(ClassificationRecord)\
+                    .filter(ClassificationRecord.id > last_id)\
+                    .filter(ClassificationRecord.deleted_at.is_(None))\
+                    .filter(ClassificationRecord.timestamp < cutoff)\
+                    .filter(~ClassificationRecord.image_path.startswith(archive_prefix))\
+                    .order_by(ClassificationRecord.id)\
+                    .limit(MAINTENANCE_BATCH_SIZE)\
+                    .all()
+                for record in records:
+                    last_id = record.id
+                    if not os.path.exists(record.image_path):
+                        continue
+                    try:
+                        record.image_path = archive_image(record.image_path)
+                        archived += 1
+                    except OSError as e:
+                        print(f"Could not archive {record.image_path}: {e}")
+                db.commit()
+            finally:
+                db.close()
+
+            if len(records) < MAINTENANCE_BATCH_SIZE:
+                break
+            self._throttle()
+
+        return archived
+
+    def vacuum(self) -> bool:
+        """
+        Refresh planner statistics and reclaim free pages.
+
+        VACUUM locks the whole SQLite database while it rebuilds it, so it
+        only starts once no upload is in flight; otherwise it is skipped
+        and tried again on the next run.
+        """
+        if not self._wait_for_idle():
+            return False
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("VACUUM")
+        self._last_vacuum = time.monotonic()
+        return True
+
+# Global maintenance job
+maintenance_job = MaintenanceJob()
@@ -1,10 +1,37 @@
 import torch
 import torchvision.models as models
+import numpy as np
 import os
+import time
+import random
+import hashlib
+import threading
+import asyncio
+import anyio.from_thread
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
 from dotenv import load_dotenv
 
+from utils import generate_tta_views, TTA_VIEW_NAMES
+from admission import admission, AdmissionRejected, PRIORITY_BATCH
+
 load_dotenv()
 
+# Test-time augmentation settings
+TTA_VIEWS = min(int(os.getenv("TTA_VIEWS", "8")), len(TTA_VIEW_NAMES))
+TTA_CONFIDENCE_THRESHOLD = float(os.getenv("TTA_CONFIDENCE_THRESHOLD", "0.6"))
+
+# Number of classes listed in a prediction's differential by default
+DEFAULT_TOP_K = 3
+
+# New model versions can only be loaded from this directory
+MODEL_DIR = Path(os.getenv("MODEL_DIR", "./model_weights"))
+# How long a retired version may take to finish in-flight work
+MODEL_DRAIN_TIMEOUT = float(os.getenv("MODEL_DRAIN_TIMEOUT", "60"))
+# Shadow samples waiting or running at once; further samples are dropped
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "4"))
+
 # Class names from the training dataset
 CLASS_NAMES = [
     "actinic keratosis",
@@ -18,34 +45,50 @@ CLASS_NAMES = [
     "vascular lesion"
 ]
 
-class ModelLoader:
-    """Singleton class for loading and managing the EfficientNet model"""
+def summarize_probabilities(probabilities: np.ndarray, top_k: int = DEFAULT_TOP_K) -> dict:
+    """
+    Build a prediction result from one probability vector.
     
-    _instance = None
-    _model = None
-    _device = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ModelLoader, cls).__new__(cls)
-        return cls._instance
+    Args:
+        probabilities: Class probabilities of shape (num_classes,)
+        top_k: Number of most likely classes to list
+        
+    Returns:
+        Dict with prediction, confidence, top_k and probabilities
+    """
+    order = np.argsort(-probabilities, kind="stable")[:top_k]
     
-    def __init__(self):
-        if self._model is None:
-            self._load_model()
+    return {
+        "prediction": CLASS_NAMES[order[0]],
+        "confidence": float(probabilities[order[0]]),
+        "top_k": [
+            {"class_name": CLASS_NAMES[idx], "probability": float(probabilities[idx])}
+            for idx in order
+        ],
+        "probabilities": probabilities,
+    }
+
+def _file_digest(path: str) -> str:
+    """Short SHA-256 digest of a file, used as the default model version"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+class ModelVersion:
+    """One loaded set of EfficientNet weights and its serving statistics"""
     
-    def _load_model(self):
-        """Load the EfficientNet model with trained weights"""
-        model_path = os.getenv("MODEL_PATH", "./model_weights/best_EfficientNet.pt")
+    def __init__(self, model_path: str, version: str = None):
+        self.path = str(model_path)
+        self.version = version or _file_digest(model_path)
+        self.loaded_at = None
         
         # Determine device
         self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Using device: {self._device}")
         
-        # Load model architecture
+        # Load model architecture and trained weights
         self._model = models.efficientnet_b0(weights=None)
-        
-        # Load trained weights
         state_dict = torch.load(model_path, map_location=self._device)
         self._model.load_state_dict(state_dict)
         
@@ -53,7 +96,285 @@ class ModelLoader:
         self._model.to(self._device)
         self._model.eval()
         
-        print(f"Model loaded successfully from {model_path}")
+        self._single_pass_ms = None
+        self.requests = 0
+        self.shadow_requests = 0
+        self.shadow_agreements = 0
+        self.shadow_latency_ms = None
+        
+        # Tracks in-flight calls so a retired version can be drained
+        self.in_flight = 0
+        self.retired = False
+        self._idle = threading.Condition()
+    
+    def warmup(self, runs: int = 2):
+        """Run dummy batches so the first real request does not pay for lazy init"""
+        dummy = torch.zeros(1, 3, 224, 224)
+        for _ in range(runs):
+            self._probabilities(dummy)
+        self.loaded_at = time.time()
+    
+    def acquire(self) -> bool:
+        """Register an in-flight call; fails once the version is retired"""
+        with self._idle:
+            if self.retired:
+                return False
+            self.in_flight += 1
+            return True
+    
+    def release(self):
+        with self._idle:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.notify_all()
+    
+    def drain(self, timeout: float = MODEL_DRAIN_TIMEOUT) -> bool:
+        """Stop accepting calls, wait for in-flight ones, then free the weights"""
+        with self._idle:
+            self.retired = True
+            drained = self._idle.wait_for(lambda: self.in_flight == 0, timeout)
+        
+        if not drained:
+            # Leave the weights to be garbage collected once the stragglers finish
+            print(f"Model version {self.version} still busy after {timeout}s, not waiting")
+            return False
+        
+        self._model = None
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        
+        return True
+    
+    def predict_detailed(self, image_tensor: torch.Tensor, top_k: int = DEFAULT_TOP_K) -> dict:
+        """
+        Make prediction and keep the full probability distribution.
+        
+        Args:
+            image_tensor: Preprocessed image tensor of shape (1, C, H, W)
+            top_k: Number of most likely classes to return
+            
+        Returns:
+            Dict with predicted class, confidence, top-k classes, the full
+            probability vector as a NumPy array and the model version
+        """
+        start = time.perf_counter()
+        probabilities = self._probabilities(image_tensor)[0]
+        self._track_single_pass((time.perf_counter() - start) * 1000)
+        self.requests += 1
+        
+        result = summarize_probabilities(probabilities, top_k)
+        result["model_version"] = self.version
+        return result
+    
+    def predict_batch(self, image_tensors: torch.Tensor, top_k: int = DEFAULT_TOP_K) -> list[dict]:
+        """
+        Make predictions for a batch of images in one forward pass.
+        
+        Args:
+            image_tensors: Preprocessed images of shape (N, C, H, W)
+            top_k: Number of most likely classes to return per image
+            
+        Returns:
+            One result dict per image, as returned by predict_detailed
+        """
+        probabilities = self._probabilities(image_tensors)
+        self.requests += len(probabilities)
+        
+        results = [summarize_probabilities(row, top_k) for row in probabilities]
+        for result in results:
+            result["model_version"] = self.version
+        return results
+    
+    def predict_tta(self, image_tensor: torch.Tensor, n_views: int = TTA_VIEWS, top_k: int = DEFAULT_TOP_K) -> dict:
+        """
+        Make prediction averaged over test-time augmented views.
+        
+        All views are generated from the already decoded image tensor and
+        scored in a single batched forward pass.
+        
+        Args:
+            image_tensor: Preprocessed image tensor of shape (1, C, H, W)
+            n_views: Number of augmented views (including the original)
+            top_k: Number of most likely classes to return
+            
+        Returns:
+            Dict as returned by predict_detailed (with averaged
+            probabilities), plus the views used and latency/overhead
+            relative to a single pass
+        """
+        start = time.perf_counter()
+        
+        with torch.no_grad():
+            batch = generate_tta_views(image_tensor.to(self._device), n_views)
+            
+        probabilities = self._probabilities(batch, average=True)
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        
+        result = summarize_probabilities(probabilities, top_k)
+        result["model_version"] = self.version
+        result["views"] = TTA_VIEW_NAMES[:batch.shape[0]]
+        result["latency_ms"] = latency_ms
+        result["overhead_ratio"] = latency_ms / self._single_pass_ms if self._single_pass_ms else None
+        
+        return result
+    
+    def grad_cam(self, image_tensor: torch.Tensor, class_idx: int = None) -> tuple[np.ndarray, int]:
+        """
+        Compute a Grad-CAM map over the last convolutional block.
+        
+        The forward pass is split at the feature extractor instead of using
+        module hooks, so concurrent predictions on the shared model are not
+        affected. Only the feature map gradient is computed; parameter
+        gradients are left untouched.
+        
+        Args:
+            image_tensor: Preprocessed image tensor of shape (1, C, H, W)
+            class_idx: Class to explain (defaults to the predicted class)
+            
+        Returns:
+            Tuple of (heatmap normalized to [0, 1] with shape (h, w), class_idx)
+        """
+        image_tensor = image_tensor.to(self._device)
+        
+        with torch.enable_grad():
+            features = self._model.features(image_tensor)
+            pooled = torch.flatten(self._model.avgpool(features), 1)
+            output = self._model.classifier(pooled)
+            
+            if class_idx is None:
+                class_idx = int(output[0, :len(CLASS_NAMES)].argmax())
+            
+            gradients, = torch.autograd.grad(output[0, class_idx], features)
+        
+        with torch.no_grad():
+            weights = gradients.mean(dim=(2, 3), keepdim=True)
+            cam = torch.relu((weights * features).sum(dim=1))[0]
+            cam = cam / cam.max().clamp(min=1e-8)
+        
+        return cam.cpu().numpy(), class_idx
+    
+    def shadow_score(self, image_tensor: torch.Tensor, served_prediction: str):
+        """Score a request served by another version and record agreement"""
+        start = time.perf_counter()
+        probabilities = self._probabilities(image_tensor)[0]
+        latency_ms = (time.perf_counter() - start) * 1000
+        
+        prediction = summarize_probabilities(probabilities, 1)["prediction"]
+        self.shadow_requests += 1
+        self.shadow_agreements += prediction == served_prediction
+        self.shadow_latency_ms = latency_ms if self.shadow_latency_ms is None else 0.9 * self.shadow_latency_ms + 0.1 * latency_ms
+    
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "loaded_at": self.loaded_at,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "latency_ms": self._single_pass_ms,
+            "shadow_requests": self.shadow_requests,
+            "shadow_agreement": self.shadow_agreements / self.shadow_requests if self.shadow_requests else None,
+            "shadow_latency_ms": self.shadow_latency_ms,
+        }
+    
+    def _probabilities(self, batch: torch.Tensor, average: bool = False) -> np.ndarray:
+        """
+        Run one forward pass and copy the softmax output to host once.
+        
+        Args:
+            batch: Image batch of shape (N, C, H, W)
+            average: Average the probabilities over the batch on device
+            
+        Returns:
+            Array of shape (N, num_classes), or (num_classes,) if averaged
+        """
+        with torch.no_grad():
+            output = self._model(batch.to(self._device))
+            probabilities = torch.nn.functional.softmax(output, dim=1)
+            if average:
+                probabilities = probabilities.mean(dim=0)
+        
+        return probabilities[..., :len(CLASS_NAMES)].cpu().numpy()
+    
+    def _track_single_pass(self, latency_ms: float):
+        """Keep an exponential moving average of single-image latency"""
+        if self._single_pass_ms is None:
+            self._single_pass_ms = latency_ms
+        else:
+            self._single_pass_ms = 0.9 * self._single_pass_ms + 0.1 * latency_ms
+
+class ModelLoader:
+    """
+    Singleton registry of loaded model versions.
+    
+    One version is active and serves all requests. A candidate version can
+    be loaded and warmed up in the background, optionally shadow-scoring a
+    fraction of traffic, and then swapped in without a restart. The retired
+    version is drained of in-flight calls before its weights are freed.
+    """
+    
+    _instance = None
+    _active = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ModelLoader, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
+    def __init__(self):
+        if not self._initialized:
+            self._initialized = True
+            self._lock = threading.Lock()
+            self._load_lock = threading.Lock()
+            self._candidate = None
+            self._shadow_fraction = 0.0
+            self._shadow_pending = 0
+            self._shadow_dropped = 0
+            self._shadow_tasks = set()
+            self._loading = {}
+            self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+    
+    def ensure_loaded(self):
+        """
+        Load the default weights if no version is active yet.
+        
+        Loading is deferred to first use so that processes which never run
+        inference (API front-ends in scale-out mode) do not hold the model.
+        """
+        if self._active is None:
+            with self._load_lock:
+                if self._active is None:
+                    self._load_model()
+    
+    def _load_model(self):
+        """Load the EfficientNet model with trained weights"""
+        model_path = os.getenv("MODEL_PATH", "./model_weights/best_EfficientNet.pt")
+        
+        self._active = ModelVersion(model_path, os.getenv("MODEL_VERSION"))
+        self._active.warmup()
+        print(f"Using device: {self._active._device}")
+        print(f"Model loaded successfully from {model_path} (version {self.model_version})")
+    
+    @property
+    def model_version(self) -> str:
+        """Version of the active model"""
+        self.ensure_loaded()
+        return self._active.version
+    
+    @contextmanager
+    def _lease(self, version: ModelVersion = None):
+        """Pin a version (the active one by default) for the duration of a call"""
+        self.ensure_loaded()
+        with self._lock:
+            version = version or self._active
+            if not version.acquire():
+                raise RuntimeError(f"Model version {version.version} has been retired")
+        try:
+            yield version
+        finally:
+            version.release()
     
     def predict(self, image_tensor: torch.Tensor) -> tuple[str, float]:
         """
@@ -65,17 +386,178 @@ class ModelLoader:
         Returns:
             Tuple of (predicted_class_name, confidence_score)
         """
-        image_tensor = image_tensor.to(self._device)
+        result = self.predict_detailed(image_tensor, top_k=1)
+        return result["prediction"], result["confidence"]
+    
+    def predict_detailed(self, image_tensor: torch.Tensor, top_k: int = DEFAULT_TOP_K) -> dict:
+        """Make prediction with the active version (see ModelVersion.predict_detailed)"""
+        with self._lease() as version:
+            result = version.predict_detailed(image_tensor, top_k)
         
-        with torch.no_grad():
-            output = self._model(image_tensor)
-            probabilities = torch.nn.functional.softmax(output, dim=1)
-            confidence, predicted_idx = torch.max(probabilities, 1)
+        self._maybe_shadow(image_tensor, result["prediction"])
+        return result
+    
+    def predict_batch(self, image_tensors: torch.Tensor, top_k: int = DEFAULT_TOP_K) -> list[dict]:
+        """Make batched predictions with the active version (see ModelVersion.predict_batch)"""
+        with self._lease() as version:
+            return version.predict_batch(image_tensors, top_k)
+    
+    def predict_tta(self, image_tensor: torch.Tensor, n_views: int = TTA_VIEWS, top_k: int = DEFAULT_TOP_K) -> dict:
+        """Make a TTA prediction with the active version (see ModelVersion.predict_tta)"""
+        with self._lease() as version:
+            return version.predict_tta(image_tensor, n_views, top_k)
+    
+    def grad_cam(self, image_tensor: torch.Tensor, class_idx: int = None) -> tuple[np.ndarray, int]:
+        """Compute Grad-CAM with the active version (see ModelVersion.grad_cam)"""
+        with self._lease() as version:
+            return version.grad_cam(image_tensor, class_idx)
+    
+    def _maybe_shadow(self, image_tensor: torch.Tensor, served_prediction: str):
+        """
+        Send a sample of traffic to the candidate version, off the request path.
+        
+        At most SHADOW_MAX_PENDING samples are held at once; beyond that
+        the sample is dropped. When called from a request, the shadow pass
+        also takes a batch-priority slot of the "inference" admission stage,
+        so it yields to live traffic and is dropped when the stage is full.
+        """
+        candidate = self._candidate
+        if candidate is None or random.random() >= self._shadow_fraction:
+            return
+        
+        with self._lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                self._shadow_dropped += 1
+                return
+            self._shadow_pending += 1
+        
+        def score():
+            try:
+                with self._lease(candidate) as version:
+                    version.shadow_score(image_tensor, served_prediction)
+            except RuntimeError:
+                pass  # candidate was replaced meanwhile
+        
+        try:
+            anyio.from_thread.run_sync(self._schedule_shadow, score)
+        except RuntimeError:
+            # Not called from a request (no event loop), so not admission-controlled
+            def run():
+                try:
+                    score()
+                finally:
+                    self._shadow_done()
             
-        predicted_class = CLASS_NAMES[predicted_idx.item()]
-        confidence_score = confidence.item()
+            self._shadow_executor.submit(run)
+    
+    def _schedule_shadow(self, score):
+        """Start a shadow pass task (runs on the event loop)"""
+        task = asyncio.ensure_future(self._run_shadow(score))
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+    
+    async def _run_shadow(self, score):
+        """Run a shadow pass inside the inference admission stage"""
+        dropped = False
+        try:
+            async with admission.slot("inference", PRIORITY_BATCH):
+                await asyncio.get_running_loop().run_in_executor(self._shadow_executor, score)
+        except AdmissionRejected:
+            dropped = True
+        finally:
+            self._shadow_done(dropped)
+    
+    def _shadow_done(self, dropped: bool = False):
+        with self._lock:
+            self._shadow_pending -= 1
+            self._shadow_dropped += dropped
+    
+    def load_version(self, model_path: str, version: str = None, activate: bool = False, shadow_fraction: float = 0.0) -> str:
+        """
+        Load and warm up new weights in a background thread.
+        
+        Args:
+            model_path: Weights file inside MODEL_DIR
+            version: Version label (defaults to a digest of the weights)
+            activate: Swap the new version in as soon as it is ready
+            shadow_fraction: Otherwise, fraction of traffic to shadow-score
+                on it as a candidate
+                
+        Returns:
+            Label under which loading progress is reported
+        """
+        path = Path(model_path).resolve()
+        if MODEL_DIR.resolve() not in path.parents:
+            raise ValueError(f"Model weights must be inside {MODEL_DIR}")
+        if not path.is_file():
+            raise ValueError(f"Model weights not found: {model_path}")
         
-        return predicted_class, confidence_score
+        label = version or path.name
+        self._loading[label] = "loading"
+        
+        def load():
+            try:
+                candidate = ModelVersion(path, version)
+                candidate.warmup()
+            except Exception as e:
+                self._loading[label] = f"failed: {e}"
+                return
+            
+            self._loading.pop(label, None)
+            if activate:
+                self._swap(candidate)
+            else:
+                self._set_candidate(candidate, shadow_fraction)
+            print(f"Model version {candidate.version} ready ({'active' if activate else 'candidate'})")
+        
+        threading.Thread(target=load, name=f"load-{label}", daemon=True).start()
+        return label
+    
+    def _set_candidate(self, candidate: ModelVersion, shadow_fraction: float):
+        with self._lock:
+            previous = self._candidate
+            self._candidate = candidate
+            self._shadow_fraction = shadow_fraction
+        
+        if previous is not None:
+            threading.Thread(target=previous.drain, daemon=True).start()
+    
+    def _swap(self, new_version: ModelVersion):
+        """Atomically make a version active and drain the old one"""
+        with self._lock:
+            retired = self._active
+            self._active = new_version
+            if self._candidate is new_version:
+                self._candidate = None
+                self._shadow_fraction = 0.0
+        
+        if retired is not None:
+            threading.Thread(target=retired.drain, daemon=True).start()
+    
+    def activate_candidate(self, version: str):
+        """
+        Promote the candidate version to active.
+        
+        Raises:
+            ValueError: If the candidate is not loaded under this version
+        """
+        candidate = self._candidate
+        if candidate is None or candidate.version != version:
+            raise ValueError(f"No candidate model with version {version}")
+        self._swap(candidate)
+    
+    def status(self) -> dict:
+        """Active and candidate versions with their latency/agreement stats"""
+        self.ensure_loaded()
+        candidate = self._candidate
+        return {
+            "active": self._active.stats(),
+            "candidate": candidate.stats() if candidate else None,
+            "shadow_fraction": self._shadow_fraction,
+            "shadow_pending": self._shadow_pending,
+            "shadow_dropped": self._shadow_dropped,
+            "loading": dict(self._loading),
+        }
 
 # Global model instance
 model_loader = ModelLoader()
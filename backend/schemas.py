@@ -1,7 +1,19 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, computed_field
+from datetime import datetime, date
 from typing import Optional
 
+class ClassProbability(BaseModel):
+    """One entry of a prediction's differential"""
+    class_name: str
+    probability: float
+
+class TTAInfo(BaseModel):
+    """Details of a test-time augmented prediction"""
+    trigger: str
+    views: list[str]
+    latency_ms: float
+    overhead_ratio: Optional[float] = None
+
 class PredictionResponse(BaseModel):
     """Response model for prediction endpoint"""
     prediction: str
@@ -10,6 +22,11 @@ class PredictionResponse(BaseModel):
     recommendation: str
     timestamp: datetime
     session_id: str
+    model_version: Optional[str] = None
+    top_k: list[ClassProbability] = []
+    probabilities: Optional[dict[str, float]] = None
+    probabilities_float16: Optional[str] = None
+    tta: Optional[TTAInfo] = None
     
     class Config:
         from_attributes = True
@@ -21,6 +38,13 @@ class HistoryRecord(BaseModel):
     prediction: str
     confidence: float
     timestamp: datetime
+    model_version: Optional[str] = None
+    
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        """Small thumbnail for list views, instead of the full upload"""
+        return f"/images/{self.id}?size=small"
     
     class Config:
         from_attributes = True
@@ -42,3 +66,57 @@ class PredictionWithAnalysisResponse(BaseModel):
     model_response: PredictionResponse
     session_id: str
     timestamp: datetime
+
+class ClassStats(BaseModel):
+    """Per-class totals for the stats endpoint"""
+    prediction: str
+    count: int
+    mean_confidence: float
+
+class ConfidenceBin(BaseModel):
+    """One bucket of the confidence histogram"""
+    lower: float
+    upper: float
+    count: int
+
+class DailyVolume(BaseModel):
+    """Number of classifications on a given day"""
+    day: date
+    count: int
+
+class StatsResponse(BaseModel):
+    """Aggregated classification analytics"""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    total: int
+    classes: list[ClassStats]
+    confidence_histogram: list[ConfidenceBin]
+    daily_volume: list[DailyVolume]
+
+class ModelLoadRequest(BaseModel):
+    """Request to load a new model version"""
+    path: str
+    version: Optional[str] = None
+    activate: bool = False
+    shadow_fraction: float = Field(0.0, ge=0.0, le=1.0)
+
+class ModelVersionStats(BaseModel):
+    """Serving statistics of a loaded model version"""
+    version: str
+    path: str
+    loaded_at: Optional[float] = None
+    requests: int
+    in_flight: int
+    latency_ms: Optional[float] = None
+    shadow_requests: int
+    shadow_agreement: Optional[float] = None
+    shadow_latency_ms: Optional[float] = None
+
+class ModelRegistryResponse(BaseModel):
+    """Active and candidate model versions"""
+    active: ModelVersionStats
+    candidate: Optional[ModelVersionStats] = None
+    shadow_fraction: float
+    shadow_pending: int = 0
+    shadow_dropped: int = 0
+    loading: dict[str, str]
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory://" (single process) or "sqlite:///path/to/state.db" (shared
+# between local processes)
+SHARED_STORE_URL = os.getenv("SHARED_STORE_URL", "memory://")
+SHARED_STORE_MAX_ENTRIES = int(os.getenv("SHARED_STORE_MAX_ENTRIES", "10000"))
+
+class SharedStore(ABC):
+    """
+    String key/value store with per-key expiry.
+
+    Holds state that must be visible to every API process, such as chat
+    session histories and replayable prediction results. A networked
+    implementation (e.g. Redis GET/SET EX/DEL) provides the same methods.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+class MemoryStore(SharedStore):
+    """In-process store, evicting the least recently written keys when full"""
+
+    def __init__(self, max_entries: int = SHARED_STORE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+class SQLiteStore(SharedStore):
+    """Store in a SQLite file, shared by processes on one machine"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, time.time() + ttl)
+        )
+
+        # Purge expired keys now and then instead of on every write
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+def get_shared_store(url: str = SHARED_STORE_URL) -> SharedStore:
+    """Create the shared store described by a URL"""
+    if url.startswith("memory://"):
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported shared store URL: {url}")
+
+# Global shared store
+shared_store = get_shared_store()
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FRONTEND_DIR = Path(os.getenv("FRONTEND_DIR", "../frontend"))
+
+# Fingerprinted assets never change under the same URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The page itself must be revalidated so it picks up new fingerprints
+PAGE_CACHE_CONTROL = "no-cache"
+
+# Only these files are ever served (never .env or other local files)
+ASSET_EXTENSIONS = {".js", ".css", ".png", ".jpg", ".jpeg", ".webp", ".svg", ".ico", ".woff2"}
+
+router = APIRouter()
+
+def _fingerprint(path: Path) -> str:
+    """Versioned file name: config.js -> config.<hash>.js"""
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:10]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+class FrontendAssets:
+    """Fingerprinted copy of the frontend, computed once at startup"""
+
+    def __init__(self, frontend_dir: Path = FRONTEND_DIR):
+        self.frontend_dir = frontend_dir
+        self.assets = {}
+        for path in frontend_dir.iterdir():
+            if path.is_file() and path.suffix in ASSET_EXTENSIONS:
+                self.assets[_fingerprint(path)] = path
+
+        # Point local references in index.html at the fingerprinted names
+        names = {path.name: name for name, path in self.assets.items()}
+        html = (frontend_dir / "index.html").read_text(encoding="utf-8")
+        html = re.sub(
+            r'(src|href)="(?:\./)?([^"/:?#]+)"',
+            lambda m: f'{m.group(1)}="/static/{names[m.group(2)]}"' if m.group(2) in names else m.group(0),
+            html
+        )
+        self.index_html = html.encode("utf-8")
+        self.index_etag = f'"{hashlib.sha256(self.index_html).hexdigest()[:16]}"'
+
+frontend = None
+
+@router.get("/app", include_in_schema=False)
+async def serve_index(request: Request):
+    """Serve the frontend page with fingerprinted asset URLs"""
+    headers = {"ETag": frontend.index_etag, "Cache-Control": PAGE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == frontend.index_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=frontend.index_html, media_type="text/html", headers=headers)
+
+@router.get("/static/{name}", include_in_schema=False)
+async def serve_asset(name: str):
+    """Serve a fingerprinted asset with long-lived caching"""
+    path = frontend.assets.get(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return FileResponse(path, headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+def init_frontend(frontend_dir: Path = FRONTEND_DIR) -> APIRouter:
+    """Fingerprint the frontend and return the router serving it"""
+    global frontend
+    frontend = FrontendAssets(frontend_dir)
+    return router
@@ -0,0 +1,157 @@
+from sqlalchemy import update, delete
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import sqlite, postgresql
+from collections import defaultdict
+from datetime import date
+
+from database import SessionLocal, ClassificationRecord, ClassificationStatsBucket
+
+# Number of equal-width confidence buckets between 0.0 and 1.0
+CONFIDENCE_BUCKETS = 10
+
+def confidence_bucket(confidence: float) -> int:
+    """Map a confidence score to its histogram bucket index"""
+    return min(max(int(confidence * CONFIDENCE_BUCKETS), 0), CONFIDENCE_BUCKETS - 1)
+
+def _record_key(record: ClassificationRecord) -> dict:
+    return {
+        "day": record.timestamp.date(),
+        "prediction": record.prediction,
+        "confidence_bucket": confidence_bucket(record.confidence),
+    }
+
+def record_classification(db: Session, record: ClassificationRecord):
+    """
+    Add a classification to the rollup table.
+
+    Runs inside the caller's transaction, so the rollup is committed
+    together with the history row. Uses a single upsert on SQLite and
+    PostgreSQL, and update-then-insert on other databases.
+    """
+    key = _record_key(record)
+    increment = {
+        "count": ClassificationStatsBucket.count + 1,
+        "confidence_sum": ClassificationStatsBucket.confidence_sum + record.confidence,
+    }
+
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    dialect = dialects.get(db.get_bind().dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(ClassificationStatsBucket).values(**key, count=1, confidence_sum=record.confidence)
+        stmt = stmt.on_conflict_do_update(index_elements=list(key), set_=increment)
+        db.execute(stmt)
+        return
+
+    updated = db.execute(
+        update(ClassificationStatsBucket).filter_by(**key).values(**increment)
+    )
+    if updated.rowcount == 0:
+        db.add(ClassificationStatsBucket(**key, count=1, confidence_sum=record.confidence))
+        db.flush()
+
+def remove_classification(db: Session, record: ClassificationRecord):
+    """
+    Remove a classification from the rollup table (caller commits).
+
+    Decrements in the database rather than read-modify-write, so an insert
+    committed concurrently into the same bucket is not lost.
+    """
+    key = _record_key(record)
+    db.execute(
+        update(ClassificationStatsBucket).filter_by(**key).values(
+            count=ClassificationStatsBucket.count - 1,
+            confidence_sum=ClassificationStatsBucket.confidence_sum - record.confidence
+        )
+    )
+    db.execute(
+        delete(ClassificationStatsBucket).filter_by(**key).where(ClassificationStatsBucket.count <= 0)
+    )
+
+def rebuild_stats(db: Session):
+    """Recompute the rollup table from scratch out of classification_history"""
+    db.query(ClassificationStatsBucket).delete()
+
+    totals = defaultdict(lambda: [0, 0.0])
+    records = db.query(ClassificationRecord.timestamp, ClassificationRecord.prediction, ClassificationRecord.confidence)\
+        .filter(ClassificationRecord.deleted_at.is_(None))
+    for timestamp, prediction, confidence in records.yield_per(1000):
+        if timestamp is None:
+            continue
+        bucket = totals[(timestamp.date(), prediction, confidence_bucket(confidence))]
+        bucket[0] += 1
+        bucket[1] += confidence
+
+    db.add_all(
+        ClassificationStatsBucket(
+            day=day,
+            prediction=prediction,
+            confidence_bucket=bucket_idx,
+            count=count,
+            confidence_sum=confidence_sum
+        )
+        for (day, prediction, bucket_idx), (count, confidence_sum) in totals.items()
+    )
+    db.commit()
+
+def ensure_stats_backfilled():
+    """Populate the rollup table from existing history if it is empty"""
+    db = SessionLocal()
+    try:
+        has_stats = db.query(ClassificationStatsBucket).first() is not None
+        has_history = db.query(ClassificationRecord.id).first() is not None
+        if has_history and not has_stats:
+            rebuild_stats(db)
+            print("Classification stats rebuilt from history")
+    finally:
+        db.close()
+
+def get_stats(db: Session, start_date: date = None, end_date: date = None) -> dict:
+    """
+    Aggregate the rollup table over an inclusive date range.
+
+    Cost depends on the number of days, classes and buckets in the range,
+    not on the number of history rows.
+    """
+    query = db.query(ClassificationStatsBucket)
+    if start_date is not None:
+        query = query.filter(ClassificationStatsBucket.day >= start_date)
+    if end_date is not None:
+        query = query.filter(ClassificationStatsBucket.day <= end_date)
+
+    class_totals = defaultdict(lambda: [0, 0.0])
+    histogram = [0] * CONFIDENCE_BUCKETS
+    daily = defaultdict(int)
+
+    for bucket in query.all():
+        class_totals[bucket.prediction][0] += bucket.count
+        class_totals[bucket.prediction][1] += bucket.confidence_sum
+        histogram[bucket.confidence_bucket] += bucket.count
+        daily[bucket.day] += bucket.count
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total": sum(histogram),
+        "classes": [
+            {
+                "prediction": prediction,
+                "count": count,
+                "mean_confidence": confidence_sum / count
+            }
+            for prediction, (count, confidence_sum) in sorted(
+                class_totals.items(), key=lambda item: item[1][0], reverse=True
+            )
+        ],
+        "confidence_histogram": [
+            {
+                "lower": idx / CONFIDENCE_BUCKETS,
+                "upper": (idx + 1) / CONFIDENCE_BUCKETS,
+                "count": count
+            }
+            for idx, count in enumerate(histogram)
+        ],
+        "daily_volume": [
+            {"day": day, "count": count}
+            for day, count in sorted(daily.items())
+        ],
+    }
@@ -0,0 +1,156 @@
+"""
+Synthetic load tests for admission control
+Run directly with: python test_admission.py (no server or model needed)
+"""
+
+import asyncio
+import sys
+import time
+
+from admission import Stage, AdmissionRejected, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+SERVICE_TIME = 0.05
+
+async def fake_request(stage, priority, results, peak):
+    """Hold a slot for SERVICE_TIME and record the outcome"""
+    start = time.perf_counter()
+    try:
+        async with stage.slot(priority):
+            peak[0] = max(peak[0], stage.in_flight)
+            await asyncio.sleep(SERVICE_TIME)
+        results.append(("ok", priority, time.perf_counter() - start, None))
+    except AdmissionRejected as e:
+        results.append((e.status_code, priority, time.perf_counter() - start, e.retry_after))
+
+def test_in_flight_limit_under_spike():
+    """A burst far above capacity never exceeds the in-flight limit"""
+    async def run():
+        stage = Stage("inference", limit=2, max_queue=6, queue_timeout=1.0)
+        results, peak = [], [0]
+        await asyncio.gather(*(fake_request(stage, PRIORITY_INTERACTIVE, results, peak) for _ in range(50)))
+        return stage, results, peak[0]
+
+    stage, results, peak = asyncio.run(run())
+    served = [r for r in results if r[0] == "ok"]
+    rejected = [r for r in results if r[0] == 429]
+
+    assert peak == 2
+    assert len(served) == 8  # 2 in flight + 6 queued
+    assert len(rejected) == 42
+    assert stage.in_flight == 0 and stage.queued == 0
+
+def test_overload_rejections_are_fast():
+    """Requests over capacity are turned away without waiting"""
+    async def run():
+        stage = Stage("inference", limit=1, max_queue=1, queue_timeout=5.0)
+        results, peak = [], [0]
+        await asyncio.gather(*(fake_request(stage, PRIORITY_INTERACTIVE, results, peak) for _ in range(20)))
+        return results
+
+    rejected = [r for r in asyncio.run(run()) if r[0] == 429]
+    assert len(rejected) == 18
+    assert max(r[2] for r in rejected) < SERVICE_TIME / 5
+    assert all(r[3] >= 1 for r in rejected)
+
+def test_queue_deadline():
+    """Requests that cannot be served before the deadline get 503"""
+    async def run():
+        stage = Stage("inference", limit=1, max_queue=10, queue_timeout=SERVICE_TIME * 2.5)
+        results, peak = [], [0]
+        await asyncio.gather(*(fake_request(stage, PRIORITY_INTERACTIVE, results, peak) for _ in range(6)))
+        return stage, results
+
+    stage, results = asyncio.run(run())
+    served = [r for r in results if r[0] == "ok"]
+    timed_out = [r for r in results if r[0] == 503]
+
+    assert len(served) == 3
+    assert len(timed_out) == 3
+    assert stage.in_flight == 0 and stage.queued == 0
+
+def test_interactive_priority():
+    """Queued interactive requests are admitted before queued batch requests"""
+    async def run():
+        stage = Stage("inference", limit=1, max_queue=20, queue_timeout=5.0)
+        order = []
+
+        async def request(priority, tag):
+            async with stage.slot(priority):
+                order.append(tag)
+                await asyncio.sleep(0.01)
+
+        # Occupy the slot, then queue batch work followed by interactive work
+        blocker = asyncio.create_task(request(PRIORITY_INTERACTIVE, "first"))
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(request(PRIORITY_BATCH, f"batch{i}")) for i in range(5)]
+        tasks += [asyncio.create_task(request(PRIORITY_INTERACTIVE, f"interactive{i}")) for i in range(5)]
+        await asyncio.gather(blocker, *tasks)
+        return order
+
+    order = asyncio.run(run())
+    assert order[0] == "first"
+    assert all(tag.startswith("interactive") for tag in order[1:6])
+    assert all(tag.startswith("batch") for tag in order[6:])
+
+def test_batch_shed_first():
+    """Batch requests are rejected once half of the queue is used"""
+    async def run():
+        stage = Stage("inference", limit=1, max_queue=8, queue_timeout=5.0)
+        results, peak = [], [0]
+        load = [PRIORITY_BATCH] * 20 + [PRIORITY_INTERACTIVE] * 4
+        await asyncio.gather(*(fake_request(stage, priority, results, peak) for priority in load))
+        return results
+
+    results = asyncio.run(run())
+    served_interactive = [r for r in results if r[0] == "ok" and r[1] == PRIORITY_INTERACTIVE]
+    served_batch = [r for r in results if r[0] == "ok" and r[1] == PRIORITY_BATCH]
+
+    assert len(served_interactive) == 4
+    assert len(served_batch) == 5  # 1 in flight + 4 queue places
+
+def test_cancelled_waiter_frees_queue():
+    """A client disconnecting while queued does not leak a slot"""
+    async def run():
+        stage = Stage("inference", limit=1, max_queue=5, queue_timeout=5.0)
+        results, peak = [], [0]
+        holder = asyncio.create_task(fake_request(stage, PRIORITY_INTERACTIVE, results, peak))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(fake_request(stage, PRIORITY_INTERACTIVE, results, peak))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        await fake_request(stage, PRIORITY_INTERACTIVE, results, peak)
+        return stage, results
+
+    stage, results = asyncio.run(run())
+    assert len([r for r in results if r[0] == "ok"]) == 2
+    assert stage.in_flight == 0 and stage.queued == 0
+
+def main():
+    print("=" * 60)
+    print("Admission Control Load Tests")
+    print("=" * 60)
+
+    tests = [
+        test_in_flight_limit_under_spike,
+        test_overload_rejections_are_fast,
+        test_queue_deadline,
+        test_interactive_priority,
+        test_batch_shed_first,
+        test_cancelled_waiter_frees_queue,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__doc__} {e}")
+
+    print("=" * 60)
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
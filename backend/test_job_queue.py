@@ -0,0 +1,206 @@
+"""
+Multi-process tests for the job queue and shared store used in scale-out mode
+Run directly with: python test_job_queue.py (no server or model needed)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import job_queue
+from job_queue import JobQueue, SQLiteJobQueue, InProcessJobQueue, JobFailed, serve_jobs, DONE, FAILED
+from shared_store import SharedStore, SQLiteStore, MemoryStore
+
+WORKERS = 4
+JOBS = 200
+
+def square_batch(payloads):
+    """Stand-in for run_inference_batch: one "forward pass" per batch"""
+    time.sleep(0.005)
+    return [
+        ValueError("bad input") if p["n"] < 0 else {"square": p["n"] ** 2, "pid": os.getpid(), "batch": len(payloads)}
+        for p in payloads
+    ]
+
+def worker_process(path, stop_event, processed):
+    queue = SQLiteJobQueue(path)
+
+    def handler(payloads):
+        with processed.get_lock():
+            processed.value += len(payloads)
+        return square_batch(payloads)
+
+    serve_jobs(queue, handler, batch_size=8, poll_interval=0.01, stop_event=stop_event)
+
+def store_writer_process(path):
+    SQLiteStore(path).set("chat:abc", '["hello"]', ttl=60)
+
+def test_workers_process_each_job_once():
+    """Several worker processes drain a shared SQLite queue, each job exactly once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.db")
+        queue = SQLiteJobQueue(path)
+        job_ids = [queue.enqueue({"n": n}) for n in range(JOBS)]
+
+        stop_event = multiprocessing.Event()
+        processed = multiprocessing.Value("i", 0)
+        workers = [
+            multiprocessing.Process(target=worker_process, args=(path, stop_event, processed))
+            for _ in range(WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and any(queue.get(job_id)["status"] != DONE for job_id in job_ids):
+            time.sleep(0.05)
+
+        stop_event.set()
+        for worker in workers:
+            worker.join(5)
+
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        assert all(job["status"] == DONE for job in jobs), "not all jobs finished"
+        assert [job["result"]["square"] for job in jobs] == [n ** 2 for n in range(JOBS)]
+        assert processed.value == JOBS, f"{processed.value} jobs processed"
+        assert len({job["result"]["pid"] for job in jobs}) > 1, "only one worker got jobs"
+        assert max(job["result"]["batch"] for job in jobs) > 1, "jobs were never batched"
+
+def test_failed_job_does_not_fail_batch():
+    """One bad job in a batch fails alone and wait() raises JobFailed for it"""
+    queue = InProcessJobQueue()
+    good = queue.enqueue({"n": 3})
+    bad = queue.enqueue({"n": -1})
+
+    stop_event = threading.Event()
+    thread = threading.Thread(target=serve_jobs, args=(queue, square_batch, 8, 0.01, stop_event))
+    thread.start()
+
+    async def run():
+        result = await queue.wait(good, timeout=5)
+        try:
+            await queue.wait(bad, timeout=5)
+        except JobFailed as e:
+            return result, str(e)
+        return result, None
+
+    try:
+        result, error = asyncio.run(run())
+    finally:
+        stop_event.set()
+        thread.join()
+
+    assert result["square"] == 9
+    assert error == "bad input"
+    assert queue.get(good) is None, "collected job was not removed"
+
+def test_wait_times_out_without_workers():
+    """Waiting with no workers times out and withdraws the job"""
+    queue = InProcessJobQueue()
+    job_id = queue.enqueue({"n": 1})
+
+    try:
+        asyncio.run(queue.wait(job_id, timeout=0.1))
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("wait did not time out")
+
+    assert queue.claim_batch(8) == []
+
+def test_priority_order():
+    """Interactive jobs are claimed before earlier batch jobs"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for queue in (SQLiteJobQueue(os.path.join(tmp, "jobs.db")), InProcessJobQueue()):
+            batch_ids = [queue.enqueue({"n": n}, priority=1) for n in range(3)]
+            interactive_id = queue.enqueue({"n": 99}, priority=0)
+
+            claimed = [job["id"] for job in queue.claim_batch(2)]
+            assert claimed == [interactive_id, batch_ids[0]], type(queue).__name__
+
+def test_abandoned_job_is_requeued():
+    """A job whose worker died is handed out again, then failed after max attempts"""
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteJobQueue(os.path.join(tmp, "jobs.db"))
+        job_id = queue.enqueue({"n": 1})
+
+        original = job_queue.JOB_VISIBILITY_TIMEOUT, job_queue.JOB_MAX_ATTEMPTS
+        job_queue.JOB_VISIBILITY_TIMEOUT, job_queue.JOB_MAX_ATTEMPTS = -1, 2
+        try:
+            assert [job["id"] for job in queue.claim_batch(1)] == [job_id]
+            assert [job["id"] for job in queue.claim_batch(1)] == [job_id]
+            assert queue.claim_batch(1) == []
+        finally:
+            job_queue.JOB_VISIBILITY_TIMEOUT, job_queue.JOB_MAX_ATTEMPTS = original
+
+        job = queue.get(job_id)
+        assert job["status"] == FAILED and job["error"] == "worker timed out"
+
+def test_shared_store_across_processes():
+    """A value written by one process is read by another, and expires"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        writer = multiprocessing.Process(target=store_writer_process, args=(path,))
+        writer.start()
+        writer.join(10)
+
+        store = SQLiteStore(path)
+        assert store.get("chat:abc") == '["hello"]'
+        store.set("chat:abc", "expired", ttl=-1)
+        assert store.get("chat:abc") is None
+
+    memory = MemoryStore(max_entries=2)
+    for key in "abc":
+        memory.set(key, key, ttl=60)
+    assert memory.get("a") is None and memory.get("c") == "c"
+
+def test_incomplete_backend_fails_fast():
+    """A backend missing a method fails when it is created, not when it is called"""
+    class PartialQueue(JobQueue):
+        def enqueue(self, payload, priority=0):
+            return "job"
+
+    class PartialStore(SharedStore):
+        def get(self, key):
+            return None
+
+    for backend in (PartialQueue, PartialStore):
+        try:
+            backend()
+        except TypeError:
+            continue
+        raise AssertionError(f"{backend.__name__} was instantiated")
+
+def main():
+    print("=" * 60)
+    print("Job queue and shared store tests")
+    print("=" * 60)
+
+    tests = [
+        test_workers_process_each_job_once,
+        test_failed_job_does_not_fail_batch,
+        test_wait_times_out_without_workers,
+        test_priority_order,
+        test_abandoned_job_is_requeued,
+        test_shared_store_across_processes,
+        test_incomplete_backend_fails_fast,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__doc__} {e}")
+
+    print("=" * 60)
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrency tests for the classification stats rollup
+Run directly with: python test_stats.py (no server or model needed)
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, ClassificationRecord, ClassificationStatsBucket
+from stats import record_classification
+from maintenance import tombstone
+
+def insert_record(db, confidence: float) -> ClassificationRecord:
+    record = ClassificationRecord(
+        image_path="uploads/test.jpg",
+        prediction="Melanoma",
+        confidence=confidence,
+        timestamp=datetime(2024, 1, 1, 12)
+    )
+    db.add(record)
+    db.flush()
+    record_classification(db, record)
+    return record
+
+def test_tombstone_interleaved_with_insert():
+    """A tombstone racing an insert into the same bucket keeps the rollup exact"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'stats.db')}", connect_args={"timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        setup = Session()
+        first = insert_record(setup, 0.91)
+        insert_record(setup, 0.92)
+        setup.commit()
+        first_id = first.id
+        setup.close()
+
+        # The maintenance session has read the bucket when /predict commits
+        maintenance, api = Session(), Session()
+        victim = maintenance.get(ClassificationRecord, first_id)
+        loaded = maintenance.query(ClassificationStatsBucket).all()
+        assert sum(bucket.count for bucket in loaded) == 2
+
+        insert_record(api, 0.93)
+        insert_record(api, 0.94)
+        api.commit()
+        api.close()
+
+        tombstone(maintenance, victim)
+        maintenance.commit()
+        maintenance.close()
+
+        check = Session()
+        live = check.query(ClassificationRecord).filter(ClassificationRecord.deleted_at.is_(None)).all()
+        buckets = check.query(ClassificationStatsBucket).all()
+        check.close()
+        engine.dispose()
+
+        assert len(live) == 3
+        assert [bucket.count for bucket in buckets] == [3], [bucket.count for bucket in buckets]
+        assert abs(buckets[0].confidence_sum - sum(record.confidence for record in live)) < 1e-9
+
+def test_last_tombstone_deletes_bucket():
+    """Removing the last classification in a bucket deletes the bucket"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'stats.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        record = insert_record(db, 0.5)
+        db.commit()
+        tombstone(db, record)
+        db.commit()
+
+        assert db.query(ClassificationStatsBucket).count() == 0
+        db.close()
+        engine.dispose()
+
+def main():
+    print("=" * 60)
+    print("Classification stats tests")
+    print("=" * 60)
+
+    tests = [
+        test_tombstone_interleaved_with_insert,
+        test_last_tombstone_deletes_bucket,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✓ {test.__doc__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {test.__doc__} {e}")
+
+    print("=" * 60)
+    print(f"{len(tests) - failed}/{len(tests)} passed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import uuid
+from pathlib import Path
+
+from PIL import Image, ImageOps, features
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Longest side in pixels for each thumbnail size
+THUMBNAIL_SIZES = {
+    "small": 128,
+    "medium": 256,
+    "large": 512,
+}
+
+# WebP is much smaller than JPEG for the same quality, when Pillow supports it
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_EXTENSION = ".webp" if THUMBNAIL_FORMAT == "WEBP" else ".jpg"
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_MEDIA_TYPE = "image/webp" if THUMBNAIL_FORMAT == "WEBP" else "image/jpeg"
+
+def thumbnail_path(image_path: str, size: str) -> Path:
+    """Location of a thumbnail, stored next to its upload"""
+    image_path = Path(image_path)
+    return image_path.with_name(f"{image_path.name}.{size}{THUMBNAIL_EXTENSION}")
+
+def generate_thumbnails(image_path: str, sizes: list[str] = None) -> dict[str, Path]:
+    """
+    Generate thumbnails for an upload from a single decode.
+
+    The image is decoded once at reduced scale (JPEG draft mode) and then
+    downscaled progressively from the largest to the smallest size.
+
+    Args:
+        image_path: Path of the original upload
+        sizes: Size names to generate (defaults to all sizes)
+
+    Returns:
+        Mapping of size name to thumbnail path
+    """
+    sizes = sorted(sizes or THUMBNAIL_SIZES, key=THUMBNAIL_SIZES.get, reverse=True)
+    largest = THUMBNAIL_SIZES[sizes[0]]
+
+    with Image.open(image_path) as image:
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    paths = {}
+    for size in sizes:
+        px = THUMBNAIL_SIZES[size]
+        image.thumbnail((px, px), Image.LANCZOS)
+
+        path = thumbnail_path(image_path, size)
+        # Write to a unique temporary name so concurrent generators never
+        # expose a partial file
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        image.save(tmp_path, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, path)
+        paths[size] = path
+
+    return paths
+
+def ensure_thumbnail(image_path: str, size: str) -> Path:
+    """Get a thumbnail, generating it on first request"""
+    path = thumbnail_path(image_path, size)
+    if not path.exists():
+        path = generate_thumbnails(image_path, [size])[size]
+    return path
+
+def remove_thumbnails(image_path: str):
+    """Delete all thumbnails derived from an upload"""
+    for size in THUMBNAIL_SIZES:
+        path = thumbnail_path(image_path, size)
+        if path.exists():
+            path.unlink()
+
+def file_etag(path: Path) -> str:
+    """Cheap validator derived from file metadata, without reading the file"""
+    stat = path.stat()
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
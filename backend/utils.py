@@ -2,6 +2,9 @@ import torch
 from torchvision import transforms
 from PIL import Image
 import io
+import base64
+import numpy as np
+from functools import lru_cache
 
 def get_transform():
     """
@@ -32,3 +35,79 @@ def preprocess_image(image_bytes: bytes) -> torch.Tensor:
     image_tensor = transform(image).unsqueeze(0)  # Add batch dimension
     
     return image_tensor
+
+# Test-time augmentation views, in the order they are added to the batch
+TTA_VIEW_NAMES = [
+    "identity",
+    "hflip",
+    "vflip",
+    "rot180",
+    "transpose",
+    "rot90",
+    "rot270",
+    "center_crop",
+    "center_crop_hflip",
+]
+
+@lru_cache(maxsize=8)
+def _tta_index(n_views: int, height: int, width: int, device: str) -> torch.Tensor:
+    """
+    Build a (n_views, H*W) gather index describing every TTA view.
+    
+    Flips, rotations and a nearest-neighbour center-crop zoom are all pure
+    pixel permutations/selections, so each view is just an index map over
+    the flattened source image.
+    """
+    grid = torch.arange(height * width).view(height, width)
+    
+    # 87.5% center crop resized back to full size (nearest neighbour)
+    crop_h, crop_w = int(height * 0.875), int(width * 0.875)
+    top, left = (height - crop_h) // 2, (width - crop_w) // 2
+    rows = top + torch.arange(height) * crop_h // height
+    cols = left + torch.arange(width) * crop_w // width
+    crop = grid[rows][:, cols]
+    
+    views = [
+        grid,
+        grid.flip(1),
+        grid.flip(0),
+        grid.rot90(2),
+        grid.t(),
+        grid.rot90(1),
+        grid.rot90(3),
+        crop,
+        crop.flip(1),
+    ]
+    
+    return torch.stack(views[:n_views]).view(-1, height * width).to(device)
+
+def generate_tta_views(image_tensor: torch.Tensor, n_views: int) -> torch.Tensor:
+    """
+    Generate augmented views from one preprocessed image.
+    
+    Args:
+        image_tensor: Preprocessed square image tensor of shape (1, C, H, H)
+        n_views: Number of views to generate (including the original)
+        
+    Returns:
+        Batch tensor of shape (n_views, C, H, W), built with a single gather
+    """
+    _, channels, height, width = image_tensor.shape
+    index = _tta_index(n_views, height, width, str(image_tensor.device))
+    
+    flat = image_tensor[0].reshape(channels, height * width)
+    views = flat[:, index]  # (C, n_views, H*W)
+    
+    return views.permute(1, 0, 2).reshape(-1, channels, height, width)
+
+def encode_float16(values: np.ndarray) -> str:
+    """
+    Serialize a float vector compactly for JSON responses.
+    
+    Args:
+        values: 1-D array of floats
+        
+    Returns:
+        Base64 string of the little-endian float16 bytes
+    """
+    return base64.b64encode(np.asarray(values, dtype="<f2").tobytes()).decode("ascii")
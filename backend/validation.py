@@ -0,0 +1,106 @@
+import io
+import os
+import warnings
+from PIL import Image
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Uploads larger than this are refused before they are read
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+# Width x height limit; a 40 MP RGB image already needs ~120 MB decoded
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "40000000"))
+MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", "10000"))
+# Only the first frame is classified, so animations are refused by default
+MAX_IMAGE_FRAMES = int(os.getenv("MAX_IMAGE_FRAMES", "1"))
+
+# Every other decode in the app (thumbnails, Grad-CAM, archival) refuses
+# images over the same limit (Pillow raises beyond twice this value)
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Leading bytes of each accepted format, mapped to its Pillow format name
+MAGIC_BYTES = [
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+]
+
+# Modes that convert to RGB without surprises
+ALLOWED_MODES = {"1", "L", "LA", "P", "PA", "RGB", "RGBA", "CMYK", "YCbCr"}
+
+class ImageRejected(Exception):
+    """Raised when an upload fails validation, with the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def sniff_format(data: bytes) -> str:
+    """
+    Identify the image format from its leading bytes.
+
+    Raises:
+        ImageRejected: If the bytes are not a supported image format
+    """
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "WEBP"
+    for magic, image_format in MAGIC_BYTES:
+        if data.startswith(magic):
+            return image_format
+    raise ImageRejected(415, "Unsupported image format (expected JPEG, PNG, WebP, GIF or BMP)")
+
+def validate_image(data: bytes) -> dict:
+    """
+    Check an upload against the size limits without decoding any pixels.
+
+    Only the file header is parsed (Pillow opens images lazily), so this
+    costs microseconds even for images that would take gigabytes to decode.
+
+    Args:
+        data: Raw upload bytes
+
+    Returns:
+        Dict with format, width, height, mode and frames
+
+    Raises:
+        ImageRejected: 413 if the upload or its dimensions are too large,
+            415 for unsupported formats or modes, 400 for malformed or
+            animated images
+    """
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ImageRejected(413, f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    image_format = sniff_format(data)
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(data), formats=[image_format])
+    except Image.DecompressionBombError:
+        raise ImageRejected(413, f"Image exceeds {MAX_IMAGE_PIXELS} pixels")
+    except Exception:
+        raise ImageRejected(400, "Image header could not be read")
+
+    with image:
+        width, height = image.size
+        if width > MAX_IMAGE_DIMENSION or height > MAX_IMAGE_DIMENSION:
+            raise ImageRejected(413, f"Image dimensions {width}x{height} exceed {MAX_IMAGE_DIMENSION} px")
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageRejected(413, f"Image exceeds {MAX_IMAGE_PIXELS} pixels")
+        if width == 0 or height == 0:
+            raise ImageRejected(400, "Image has no pixels")
+
+        if image.mode not in ALLOWED_MODES:
+            raise ImageRejected(415, f"Unsupported image mode: {image.mode}")
+
+        # is_animated only looks for a second frame; n_frames walks them all
+        frames = 1
+        if getattr(image, "is_animated", False):
+            frames = 2 if MAX_IMAGE_FRAMES < 2 else image.n_frames
+        if frames > MAX_IMAGE_FRAMES:
+            raise ImageRejected(400, "Animated images are not supported")
+
+        return {"format": image_format, "width": width, "height": height, "mode": image.mode, "frames": frames}
@@ -0,0 +1,40 @@
+"""
+Inference worker for scale-out mode.
+
+Pulls batches of classification jobs from the shared job queue and scores
+them with the model in one forward pass per batch. Start one or more next
+to API processes running with DEPLOYMENT_MODE=api:
+
+    JOB_QUEUE_URL=sqlite:///./jobs.db python worker.py
+"""
+
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+
+from job_queue import get_job_queue, serve_jobs
+from model_loader import model_loader
+from inference import run_inference_batch
+
+load_dotenv()
+
+# Jobs scored together in one forward pass
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "8"))
+# Sleep between polls while the queue is empty
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.05"))
+
+def main():
+    queue = get_job_queue()
+    model_loader.ensure_loaded()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+    print(f"Worker {os.getpid()} ready (batch size {WORKER_BATCH_SIZE}, model {model_loader.model_version})")
+    serve_jobs(queue, run_inference_batch, WORKER_BATCH_SIZE, WORKER_POLL_INTERVAL, stop_event)
+    print(f"Worker {os.getpid()} stopped")
+
+if __name__ == "__main__":
+    main()